@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""async_distribute.py: asyncio distribution engine for slow (e.g. network) file systems
+Reports are generated on the event loop and written by a bounded pool of threads, with at most a given number of
+writes in flight. Writes failing with a transient OSError are retried with exponential backoff. The result of each
+report is produced as soon as it is known, so that callers can show progress.
+"""
+
+# Built-in/Generic Imports
+import asyncio
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+__author__ = 'Yonglin Wang'
+__version__ = '0.1.0'
+__maintainer__ = 'Yonglin Wang'
+__email__ = 'yonglinw@brandeis.edu'
+
+# ###Default number of reports being written at the same time
+ASYNC_CONCURRENCY = 16
+
+# ###Default number of retries of a failed write, and seconds to wait before the first retry (doubled after each)
+RETRIES = 3
+RETRY_BACKOFF = 0.1
+
+# ###Errors that will not go away by retrying; any other OSError is treated as transient
+PERMANENT_ERRORS = (FileNotFoundError, IsADirectoryError, NotADirectoryError, PermissionError)
+
+# ###Result of one report: error is None if the report was saved, otherwise "<exception type>: <message>"
+WriteResult = namedtuple("WriteResult", ["grading_name", "path", "error", "attempts"])
+
+
+class AsyncDistributor:
+
+    def __init__(self, go, concurrency=ASYNC_CONCURRENCY, retries=RETRIES, backoff=RETRY_BACKOFF, writer=None):
+        """
+        :param go: GradesOut ready for distribution
+        :param concurrency: maximum number of reports generated but not yet saved, i.e. of writes in flight
+        :param retries: number of times a write failing with a transient OSError is tried again
+        :param backoff: seconds to wait before the first retry, doubled after each retry
+        :param writer: function(path, report) saving a report; go.save_report if not given
+        """
+        if concurrency < 1:
+            raise ValueError("Concurrency must be at least 1, got %d" % concurrency)
+        self.go = go
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.writer = writer if writer is not None else go.save_report
+
+    async def write(self, loop, executor, grading_name: str, path: str, report: str) -> WriteResult:
+        """
+        save one report in executor, retrying transient errors
+        :return: WriteResult of the report
+        """
+        delay = self.backoff
+        for attempt in range(1, self.retries + 2):
+            try:
+                await loop.run_in_executor(executor, self.writer, path, report)
+                return WriteResult(grading_name, path, None, attempt)
+            except PERMANENT_ERRORS as exc:
+                error = exc
+                break
+            except OSError as exc:
+                error = exc
+                if attempt <= self.retries:
+                    await asyncio.sleep(delay)
+                    delay *= 2
+        return WriteResult(grading_name, path, "%s: %s" % (type(error).__name__, str(error)), attempt)
+
+    async def results(self):
+        """
+        generate and save all reports of self.go
+        :return: async generator of WriteResult, in the order writes finish
+        """
+        loop = asyncio.get_running_loop()
+        rows = iter(self.go.all_info.items())
+        pending = set()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            try:
+                while True:
+                    # only generate the next report once a write has finished, so that slow writes hold back
+                    # generation
+                    for grading_name, feedback in rows:
+                        with self.go.profile.phase("render"):
+                            report = self.go.generate_report(grading_name.replace(",", ", "), feedback)
+                        pending.add(loop.create_task(
+                            self.write(loop, executor, grading_name, self.go.report_path(grading_name), report)))
+                        if len(pending) >= self.concurrency:
+                            break
+
+                    if not pending:
+                        return
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        yield task.result()
+            finally:
+                # let writes already started finish, e.g. if the caller stops early
+                if pending:
+                    await asyncio.wait(pending)
+
+    async def run(self, on_result=None) -> list:
+        """
+        :param on_result: called with each WriteResult as soon as it is known
+        :return: list of all WriteResults
+        """
+        results = []
+        async for result in self.results():
+            results.append(result)
+            if on_result:
+                on_result(result)
+        return results
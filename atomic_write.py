@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""atomic_write.py: write a file through a uniquely named temporary file next to it, replacing the file once complete
+Used for caches, snapshots, manifests and stores, which several jobs or shards may write at the same time. Each writer
+has its own temporary file, so that no writer ever writes into another's partial file, and readers only ever see a
+complete file: the last writer to finish wins.
+"""
+
+# Built-in/Generic Imports
+import os
+import tempfile
+from contextlib import contextmanager
+
+__author__ = 'Yonglin Wang'
+__version__ = '0.1.0'
+__maintainer__ = 'Yonglin Wang'
+__email__ = 'yonglinw@brandeis.edu'
+
+# ###Permissions of files created by open(), which mkstemp does not give its files
+UMASK = os.umask(0)
+os.umask(UMASK)
+FILE_MODE = 0o666 & ~UMASK
+
+
+@contextmanager
+def atomic_write(path: str, mode="w", **open_args):
+    """
+    open a new temporary file in the folder of path, and move it to path when the enclosed code completes. On error,
+    the temporary file is removed and path is left untouched.
+    :param mode: "w" or "wb"
+    :param open_args: other arguments of open(), e.g. encoding or newline
+    :return: file object of the temporary file
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=os.path.basename(path) + ".",
+                                    suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode, **open_args) as f:
+            os.chmod(tmp_path, FILE_MODE)
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""bench_async_distribute.py: run the asyncio distribution engine (async_distribute.py) against a throttled stand-in
+for a network share, where each write takes a while, too many writes at once are refused with a transient error and
+some writes fail at random. Checks that every report ends up saved with the right content, and compares the time
+taken at several concurrency limits with saving one report at a time.
+Run from project root: python benchmarks/bench_async_distribute.py [--students 300] [--latency 0.01] [--capacity 8]
+"""
+
+# Built-in/Generic Imports
+import asyncio
+import errno
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Own modules
+import synthetic
+from async_distribute import AsyncDistributor
+from grades_out import GradesOut, write_report
+
+__author__ = 'Yonglin Wang'
+__version__ = '0.1.0'
+__maintainer__ = 'Yonglin Wang'
+__email__ = 'yonglinw@brandeis.edu'
+
+
+class ThrottledWriter:
+    """
+    write_report as seen over a slow file server: each write takes latency seconds, writes beyond capacity in flight
+    are refused with EAGAIN, and a fraction of the others fail with EIO before anything is written
+    """
+
+    def __init__(self, latency: float, capacity: int, failure_rate: float, seed=0):
+        self.latency = latency
+        self.capacity = capacity
+        self.failure_rate = failure_rate
+        self.rng = random.Random(seed)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.refused = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, path: str, report: str):
+        with self._lock:
+            if self.in_flight >= self.capacity:
+                self.refused += 1
+                raise OSError(errno.EAGAIN, "Server busy", path)
+            if self.rng.random() < self.failure_rate:
+                self.failed += 1
+                raise OSError(errno.EIO, "Connection reset", path)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.latency)
+            write_report(path, report)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def check_reports(go: GradesOut) -> int:
+    """
+    :return: number of reports missing from disk or different from what generate_report gives
+    """
+    wrong = 0
+    for grading_name, feedback in go.all_info.items():
+        try:
+            with open(go.report_path(grading_name)) as f:
+                saved = f.read()
+        except FileNotFoundError:
+            saved = None
+        if saved != go.generate_report(grading_name.replace(",", ", "), feedback):
+            wrong += 1
+    return wrong
+
+
+def clear_reports(go: GradesOut):
+    for grading_name in go.all_info:
+        if os.path.exists(go.report_path(grading_name)):
+            os.remove(go.report_path(grading_name))
+
+
+def main():
+    parser = ArgumentParser(prog="bench_async_distribute.py",
+                            description="Benchmark and check the asyncio distribution engine on a throttled "
+                                        "stand-in for a network share.")
+    parser.add_argument("--students", type=int, default=300, help="number of students")
+    parser.add_argument("--columns", type=int, default=20, help="number of grading items on the sheet")
+    parser.add_argument("--latency", type=float, default=0.01, help="seconds each write takes")
+    parser.add_argument("--capacity", type=int, default=8, help="number of writes the server accepts at once")
+    parser.add_argument("--failure_rate", type=float, default=0.02, help="fraction of writes failing at random")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8, 32],
+                        help="concurrency limits to run the engine with")
+    args = parser.parse_args()
+
+    cwd = os.getcwd()
+    root = tempfile.mkdtemp(prefix="grades_out_bench_")
+    errors = []
+    try:
+        synthetic.make_course(root, args.students, args.columns)
+        os.chdir(root)
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            go = GradesOut(synthetic.LATTE_FOLDER, synthetic.SHEET_FILE + ".csv", assn_alias="A1", verbose=False)
+
+        print("Course: %d students, write latency %.3f s, server capacity %d, random failure rate %.2f" %
+              (args.students, args.latency, args.capacity, args.failure_rate))
+
+        # one report at a time, without failures, as a reference
+        writer = ThrottledWriter(args.latency, args.capacity, 0)
+        start = time.perf_counter()
+        for grading_name, feedback in go.all_info.items():
+            writer(go.report_path(grading_name), go.generate_report(grading_name.replace(",", ", "), feedback))
+        sequential = time.perf_counter() - start
+        print("%-18s %8.3f s" % ("One at a time", sequential))
+
+        print("%-18s %10s %8s %8s %8s %8s %9s" % ("Concurrency", "Time (s)", "Speedup", "Saved", "Failed",
+                                                  "Refused", "Max busy"))
+        for concurrency in args.concurrency:
+            clear_reports(go)
+            writer = ThrottledWriter(args.latency, args.capacity, args.failure_rate)
+            distributor = AsyncDistributor(go, concurrency=concurrency, backoff=args.latency, writer=writer)
+
+            start = time.perf_counter()
+            results = asyncio.run(distributor.run())
+            elapsed = time.perf_counter() - start
+
+            failed = [result for result in results if result.error]
+            print("%-18d %10.3f %7.1fx %8d %8d %8d %9d" % (concurrency, elapsed, sequential / elapsed,
+                                                            len(results) - len(failed), len(failed), writer.refused,
+                                                            writer.max_in_flight))
+
+            # reports that failed after all retries are expected to be missing, and no others
+            if len(results) != len(go.all_info):
+                errors.append("concurrency %d: %d results for %d students" % (concurrency, len(results),
+                                                                               len(go.all_info)))
+            if check_reports(go) != len(failed):
+                errors.append("concurrency %d: %d reports missing or wrong, %d reported as failed" % (
+                    concurrency, check_reports(go), len(failed)))
+            if writer.max_in_flight > min(concurrency, args.capacity):
+                errors.append("concurrency %d: %d writes in flight at once" % (concurrency, writer.max_in_flight))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(root, ignore_errors=True)
+
+    if errors:
+        print("Errors:\n\t" + "\n\t".join(errors))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""bench_end_to_end.py: time the main steps of a distribution on a synthetic course (see synthetic.py): name
+conversion, GradesOut construction from .csv and .xlsx, report generation and report distribution. Results can be
+saved and compared against a previous run to catch regressions.
+Run from project root: python benchmarks/bench_end_to_end.py [--students 1000] [--columns 40] [--save baseline]
+[--compare baseline]
+"""
+
+# Built-in/Generic Imports
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from collections import OrderedDict
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Own modules
+import name_convert
+import synthetic
+from grades_out import GradesOut
+
+__author__ = 'Yonglin Wang'
+__version__ = '0.1.0'
+__maintainer__ = 'Yonglin Wang'
+__email__ = 'yonglinw@brandeis.edu'
+
+# ###Folder of saved results, one .json file per label
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# ###A step slower than the compared result by more than this ratio, and by more than this many seconds (to ignore
+# noise in very short steps), counts as a regression
+REGRESSION_RATIO = 1.2
+REGRESSION_MIN_SECONDS = 0.01
+
+
+def best_time(func, repeat: int) -> float:
+    """
+    :return: fastest wall-clock time of repeat calls of func, in seconds
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def run_benchmarks(students: int, columns: int, repeat: int, xlsx: bool) -> OrderedDict:
+    """
+    generate a course in a temporary folder and time each step there
+    :return: {step: fastest time in seconds}
+    """
+    results = OrderedDict()
+    cwd = os.getcwd()
+    root = tempfile.mkdtemp(prefix="grades_out_bench_")
+    try:
+        course = synthetic.make_course(root, students, columns, xlsx=xlsx)
+        # conversion file, caches and sheet names are all relative to the project root
+        os.chdir(root)
+        latte = synthetic.LATTE_FOLDER
+
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            results["name_convert"] = best_time(
+                lambda: name_convert.generate_csv_from_folder(latte, use_cache=False), repeat)
+            # name conversion must give the names on the sheet, or every step below would fail
+            synthetic.write_conversion_file(name_convert.OUTPUT_PATH, course["names"])
+
+            results["construct_csv"] = best_time(
+                lambda: GradesOut(latte, os.path.basename(course["csv"]), assn_alias="A1", verbose=False), repeat)
+            if xlsx:
+                xlsx_file = os.path.basename(course["xlsx"])
+                results["construct_xlsx"] = best_time(
+                    lambda: GradesOut(latte, xlsx_file, assn_alias="A1", sheet_name=synthetic.SHEET_NAME,
+                                      verbose=False, sheet_cache=False), repeat)
+                results["construct_xlsx_cached"] = best_time(
+                    lambda: GradesOut(latte, xlsx_file, assn_alias="A1", sheet_name=synthetic.SHEET_NAME,
+                                      verbose=False), repeat)
+
+            go = GradesOut(latte, os.path.basename(course["csv"]), assn_alias="A1", verbose=False)
+            results["generate_report"] = best_time(
+                lambda: [go.generate_report(grading_name.replace(",", ", "), feedback)
+                         for grading_name, feedback in go.all_info.items()], repeat)
+            results["distribute_grade"] = best_time(go.distribute_grade, repeat)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(root, ignore_errors=True)
+
+    return results
+
+
+def compare(results: dict, previous: dict) -> list:
+    """
+    print each step's time next to the previous result
+    :return: list of steps slower than REGRESSION_RATIO times the previous result, and by REGRESSION_MIN_SECONDS
+    """
+    regressions = []
+    print("%-24s %10s %10s %8s" % ("Step", "Now (s)", "Before (s)", "Ratio"))
+    for step, seconds in results.items():
+        before = previous["results"].get(step)
+        if before is None:
+            print("%-24s %10.4f %10s" % (step, seconds, "-"))
+            continue
+        ratio = seconds / before if before else float("inf")
+        print("%-24s %10.4f %10.4f %7.2fx" % (step, seconds, before, ratio))
+        if ratio > REGRESSION_RATIO and seconds - before > REGRESSION_MIN_SECONDS:
+            regressions.append(step)
+    return regressions
+
+
+def main():
+    parser = ArgumentParser(prog="bench_end_to_end.py",
+                            description="Benchmark name conversion, GradesOut construction, report generation and "
+                                        "distribution on a synthetic course.")
+    parser.add_argument("--students", type=int, default=1000, help="number of students")
+    parser.add_argument("--columns", type=int, default=40, help="number of grading items on the sheet")
+    parser.add_argument("--repeat", type=int, default=3, help="number of runs of each step; the fastest is kept")
+    parser.add_argument("--no_xlsx", action="store_true", help="skip .xlsx steps (e.g. if openpyxl is not installed)")
+    parser.add_argument("--save", type=str, default=None,
+                        help="save results as benchmarks/results/<label>.json for later comparison")
+    parser.add_argument("--compare", type=str, default=None,
+                        help="compare against benchmarks/results/<label>.json and exit with status 1 if any step is "
+                             "more than %.1fx slower" % REGRESSION_RATIO)
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.students, args.columns, args.repeat, xlsx=not args.no_xlsx)
+    run = {"students": args.students, "columns": args.columns, "repeat": args.repeat,
+           "python": platform.python_version(), "platform": platform.platform(), "results": results}
+
+    print("Course: %d students x %d columns, fastest of %d runs" % (args.students, args.columns, args.repeat))
+    regressions = []
+    if args.compare:
+        with open(os.path.join(RESULTS_DIR, "%s.json" % args.compare)) as f:
+            previous = json.load(f)
+        if (previous["students"], previous["columns"]) != (args.students, args.columns):
+            print("Warning: %s was run on %d students x %d columns." %
+                  (args.compare, previous["students"], previous["columns"]))
+        regressions = compare(results, previous)
+    else:
+        for step, seconds in results.items():
+            print("%-24s %10.4f s" % (step, seconds))
+
+    if args.save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, "%s.json" % args.save)
+        with open(path, "w") as f:
+            json.dump(run, f, indent=1)
+        print("Results saved at %s" % path)
+
+    if regressions:
+        print("Slower than %s by more than %.1fx: %s" % (args.compare, REGRESSION_RATIO, ", ".join(regressions)))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""bench_folder_index.py: compare FolderIndex lookups against the linear substring scan previously used by
+GradesOut.match_name_to_folder, and check that both find the same folders, also for names that are part of other names
+(which GradesOut reports as "more than one directories") and names entered with a participant ID. No files are
+created; folder paths are synthesized in memory.
+Run from project root: python benchmarks/bench_folder_index.py [--folders 10000] [--lookups 1000]
+"""
+
+# Built-in/Generic Imports
+import os
+import random
+import string
+import sys
+import timeit
+from argparse import ArgumentParser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Own modules
+from folder_index import FolderIndex
+
+__author__ = 'Yonglin Wang'
+__version__ = '0.1.0'
+__maintainer__ = 'Yonglin Wang'
+__email__ = 'yonglinw@brandeis.edu'
+
+
+def make_names(n: int, seed=0) -> list:
+    """
+    generate n unique "First Last" LATTE names using letters only, as matched by name_convert.FOLDER_NAME_REGEX
+    """
+    rng = random.Random(seed)
+    names = set()
+    while len(names) < n:
+        names.add("%s %s" % ("".join(rng.choice(string.ascii_lowercase) for _ in range(7)).title(),
+                             "".join(rng.choice(string.ascii_lowercase) for _ in range(9)).title()))
+    return sorted(names)
+
+
+def main():
+    parser = ArgumentParser(prog="bench_folder_index.py",
+                            description="Benchmark LATTE folder lookups: linear scan vs. FolderIndex.")
+    parser.add_argument("--folders", type=int, default=10000, help="number of synthetic LATTE folders")
+    parser.add_argument("--lookups", type=int, default=1000, help="number of names looked up in each timed run")
+    args = parser.parse_args()
+
+    names = make_names(args.folders)
+    # a few names that are part of other names, e.g. "Ann Lee" of "Joann Lee"
+    names += sorted(set(name[2:] for name in names[::max(1, len(names) // 20)]))
+    all_subs = set(os.path.join("A1", "%s_%d_assignsubmission_file_" % (name, 2898000 + i))
+                   for i, name in enumerate(names))
+    queries = random.Random(1).sample(names, min(args.lookups, len(names)))
+
+    def linear_scan():
+        for latte_name in queries:
+            [d for d in all_subs if latte_name in d]
+
+    index = FolderIndex(all_subs)
+
+    def indexed():
+        for latte_name in queries:
+            index.lookup(latte_name)
+
+    build = min(timeit.repeat(lambda: FolderIndex(all_subs), number=1, repeat=3))
+    scan = min(timeit.repeat(linear_scan, number=1, repeat=3))
+    lookup = min(timeit.repeat(indexed, number=1, repeat=3))
+
+    print("Folders: %d, lookups per run: %d" % (len(all_subs), len(queries)))
+    print("Linear scan:         %10.4f s (%.2f us/lookup)" % (scan, scan / len(queries) * 1e6))
+    print("FolderIndex build:   %10.4f s" % build)
+    print("FolderIndex lookups: %10.4f s (%.2f us/lookup)" % (lookup, lookup / len(queries) * 1e6))
+    print("Projected full match of all %d names: scan %.2f s vs index %.4f s" %
+          (len(names), scan / len(queries) * len(names), build + lookup / len(queries) * len(names)))
+
+    # every name, and names with the start of their participant ID, must match the same folders as in the scan
+    checked = names + ["%s_%s" % (name, str(2898000 + i)[:5]) for i, name in enumerate(names[::100])]
+    differ = [latte_name for latte_name in checked
+              if sorted(index.lookup(latte_name)) != sorted(d for d in all_subs if latte_name in d)]
+    print("Names matching several folders: %d; lookups differing from the scan: %d of %d" % (
+        sum(len(index.lookup(latte_name)) > 1 for latte_name in names), len(differ), len(checked)))
+    if differ:
+        print("Differing names: %s" % "; ".join(differ[:10]))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
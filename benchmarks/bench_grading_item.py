@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""bench_grading_item.py: compare parsing every header of many grading sheets sharing one rubric (as in a job of many
+assignments and sections) with GradingItem against parse_header_row and its item cache, and measure the memory taken
+by each GradingItem.
+Run from project root: python benchmarks/bench_grading_item.py [--columns 200] [--sheets 50]
+"""
+
+# Built-in/Generic Imports
+import os
+import sys
+import time
+from argparse import ArgumentParser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Own modules
+import synthetic
+from grading_item import GradingItem, ITEM_CACHE, parse_header_row
+
+__author__ = 'Yonglin Wang'
+__version__ = '0.1.0'
+__maintainer__ = 'Yonglin Wang'
+__email__ = 'yonglinw@brandeis.edu'
+
+
+def main():
+    parser = ArgumentParser(prog="bench_grading_item.py",
+                            description="Benchmark header parsing: GradingItem per header vs. parse_header_row.")
+    parser.add_argument("--columns", type=int, default=200, help="number of grading items on each sheet")
+    parser.add_argument("--sheets", type=int, default=50, help="number of sheets sharing the same rubric")
+    args = parser.parse_args()
+
+    headers = synthetic.make_headers(args.columns)
+
+    start = time.perf_counter()
+    uncached = [[GradingItem(header) for header in headers] for _ in range(args.sheets)]
+    uncached_time = time.perf_counter() - start
+
+    ITEM_CACHE.clear()
+    start = time.perf_counter()
+    cached = [parse_header_row(headers) for _ in range(args.sheets)]
+    cached_time = time.perf_counter() - start
+
+    if any([(item.prefix, item.suffix, item.is_comment) for item in items] !=
+           [(item.prefix, item.suffix, item.is_comment) for item in row]
+           for items, (row, _) in zip(uncached, cached)):
+        raise RuntimeError("parse_header_row gives different items than GradingItem.")
+
+    # same attributes on an object with an instance dictionary, as GradingItem had before __slots__
+    class DictItem:
+        def __init__(self, item):
+            self.is_comment, self.prefix, self.suffix = item.is_comment, item.prefix, item.suffix
+
+    slots_size = sys.getsizeof(uncached[0][0])
+    dict_item = DictItem(uncached[0][0])
+    dict_size = sys.getsizeof(dict_item) + sys.getsizeof(dict_item.__dict__)
+
+    print("Sheets: %d x %d columns, items identical" % (args.sheets, args.columns))
+    print("GradingItem per header: %8.4f s" % uncached_time)
+    print("parse_header_row:       %8.4f s (%.1fx), %d hits / %d misses" % (
+        cached_time, uncached_time / cached_time, ITEM_CACHE.hits, ITEM_CACHE.misses))
+    print("Memory per GradingItem: %8d bytes, %d bytes with an instance dictionary (strings not counted)" % (
+        slots_size, dict_size))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""bench_name_match.py: compare NameIndex suggestions against scoring every LATTE name pairwise, for misspelled grading
+names. No files are created; names are synthesized in memory.
+Run from project root: python benchmarks/bench_name_match.py [--names 10000] [--queries 200]
+"""
+
+# Built-in/Generic Imports
+import os
+import random
+import string
+import sys
+import timeit
+from argparse import ArgumentParser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Own modules
+import synthetic
+from name_match import NameIndex, name_trigrams
+
+__author__ = 'Yonglin Wang'
+__version__ = '0.1.0'
+__maintainer__ = 'Yonglin Wang'
+__email__ = 'yonglinw@brandeis.edu'
+
+
+def misspell(name: str, rng: random.Random) -> str:
+    """
+    :return: name with one letter replaced
+    """
+    i = rng.randrange(len(name))
+    return name[:i] + rng.choice(string.ascii_lowercase) + name[i + 1:]
+
+
+def main():
+    parser = ArgumentParser(prog="bench_name_match.py",
+                            description="Benchmark name suggestions: pairwise scoring vs. NameIndex.")
+    parser.add_argument("--names", type=int, default=10000, help="number of synthetic LATTE names")
+    parser.add_argument("--queries", type=int, default=200, help="number of misspelled grading names looked up")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    pairs = synthetic.make_names(args.names)
+    latte_names = ["%s %s" % (first, last) for first, last in pairs]
+    targets = rng.sample(range(len(pairs)), min(args.queries, len(pairs)))
+    queries = ["%s,%s" % (misspell(pairs[i][1], rng), pairs[i][0]) for i in targets]
+
+    def pairwise():
+        # trigrams of LATTE names computed once, as the index does
+        grams = [name_trigrams(name) for name in latte_names]
+        best = []
+        for query in queries:
+            query_grams = name_trigrams(query)
+            scores = [2 * len(query_grams & other) / (len(query_grams) + len(other)) for other in grams]
+            best.append(latte_names[max(range(len(scores)), key=scores.__getitem__)])
+        return best
+
+    index = NameIndex(latte_names)
+
+    def indexed():
+        return [index.suggest(query, limit=1)[0][0] for query in queries]
+
+    build = min(timeit.repeat(lambda: NameIndex(latte_names), number=1, repeat=3))
+    scan = min(timeit.repeat(pairwise, number=1, repeat=3))
+    lookup = min(timeit.repeat(indexed, number=1, repeat=3))
+
+    found = sum(best == latte_names[i] for best, i in zip(indexed(), targets))
+    print("LATTE names: %d, misspelled grading names: %d" % (len(latte_names), len(queries)))
+    print("Pairwise scoring:    %10.4f s (%.2f ms/name)" % (scan, scan / len(queries) * 1e3))
+    print("NameIndex build:     %10.4f s" % build)
+    print("NameIndex suggest:   %10.4f s (%.2f ms/name)" % (lookup, lookup / len(queries) * 1e3))
+    print("Best suggestion correct: %d of %d (pairwise agrees: %s)" % (found, len(queries), pairwise() == indexed()))
+
+
+if __name__ == "__main__":
+    main()
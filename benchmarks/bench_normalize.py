@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""bench_normalize.py: compare time and peak memory of sheet normalization plus row conversion, between the previous
+cell-by-cell implementation and GradesOut.normalize_dataframe / GradesOut.build_row_view, on a synthetic sheet.
+Run from project root: python benchmarks/bench_normalize.py [--rows 50000] [--columns 30]
+"""
+
+# Built-in/Generic Imports
+import os
+import sys
+import time
+import tracemalloc
+import warnings
+from argparse import ArgumentParser
+from collections import OrderedDict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Libs
+import pandas as pd
+
+# Own modules
+from grades_out import GradesOut, NAME_COL, NAME_VALUES_TO_DROP
+
+__author__ = 'Yonglin Wang'
+__version__ = '0.1.0'
+__maintainer__ = 'Yonglin Wang'
+__email__ = 'yonglinw@brandeis.edu'
+
+
+def make_raw_sheet(rows: int, columns: int) -> pd.DataFrame:
+    """
+    headerless DataFrame as read from a .csv grading sheet: header row, student rows, empty and #REF! rows, and an
+    empty column
+    """
+    header = [NAME_COL] + [">Pt %d /1" % i for i in range(columns - 2)] + ["Grader Comment", None]
+    data = [header]
+    for r in range(rows):
+        data.append(["Last%d,First%d" % (r, r)] + [str(r % 7 * 0.25) if r % 5 else None for _ in range(columns - 2)]
+                    + ["Nice work\non part %d" % r if r % 3 else None, None])
+        if r % 1000 == 0:
+            data.append([None] * columns)
+            data.append(["#REF!"] + ["1"] * (columns - 1))
+    return pd.DataFrame(data, dtype="str")
+
+
+def legacy_normalize(df: pd.DataFrame) -> OrderedDict:
+    """
+    normalization and row conversion as previously done in GradesOut
+    """
+    df.dropna(how="all", inplace=True)
+    df.dropna(axis=1, how="all", inplace=True)
+    df.fillna("", inplace=True)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        df = df.applymap(str)
+    df.columns = df.iloc[0]
+    df = df[1:]
+    df.columns.name = ""
+    df = df[~df[NAME_COL].isin(NAME_VALUES_TO_DROP)]
+    return df.set_index(NAME_COL).to_dict(orient="index", into=OrderedDict)
+
+
+def current_normalize(df: pd.DataFrame) -> OrderedDict:
+    go = GradesOut.__new__(GradesOut)
+    go.df = df
+    go.normalize_dataframe()
+    return go.build_row_view()
+
+
+def measure(func, df: pd.DataFrame):
+    """
+    :return: (result, seconds, peak traced memory in MiB)
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(df)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = ArgumentParser(prog="bench_normalize.py",
+                            description="Benchmark grading sheet normalization: previous vs. current implementation.")
+    parser.add_argument("--rows", type=int, default=50000, help="number of students on the sheet")
+    parser.add_argument("--columns", type=int, default=30, help="number of columns on the sheet")
+    args = parser.parse_args()
+
+    raw = make_raw_sheet(args.rows, args.columns)
+    legacy, legacy_time, legacy_peak = measure(legacy_normalize, raw.copy())
+    current, current_time, current_peak = measure(current_normalize, raw.copy())
+
+    if [(name, tuple(entry.values())) for name, entry in legacy.items()] != list(current.items()):
+        raise RuntimeError("Normalized rows differ from the previous implementation.")
+
+    print("Sheet: %d rows x %d columns, rows identical" % (args.rows, args.columns))
+    print("Previous: %8.3f s, peak %8.1f MiB" % (legacy_time, legacy_peak))
+    print("Current:  %8.3f s, peak %8.1f MiB" % (current_time, current_peak))
+
+
+if __name__ == "__main__":
+    main()
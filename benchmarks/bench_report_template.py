@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""bench_report_template.py: compare ReportTemplate rendering against the previous per-cell report generation of
+GradesOut.generate_report, on a synthetic sheet. Also checks that both produce identical reports.
+Run from project root: python benchmarks/bench_report_template.py [--columns 200] [--rows 5000]
+"""
+
+# Built-in/Generic Imports
+import os
+import random
+import sys
+import time
+from argparse import ArgumentParser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Own modules
+from grades_out import REPORT_TITLE
+from grading_item import GradingItem
+from report_template import ReportTemplate
+
+__author__ = 'Yonglin Wang'
+__version__ = '0.1.0'
+__maintainer__ = 'Yonglin Wang'
+__email__ = 'yonglinw@brandeis.edu'
+
+
+def legacy_report(items: list, assignment_name: str, name: str, values: list) -> str:
+    """
+    report generation as previously done by GradesOut.generate_report
+    """
+    output = "%s %s\n\nStudent Name: %s\n\n" % (REPORT_TITLE.strip(), assignment_name.replace("\n", "\n\t"), name)
+    for info, item in zip(values, items):
+        output += item.insert_info(info)
+    return output
+
+
+def make_sheet(columns: int, rows: int, seed=0):
+    """
+    :return: (list of item headers, list of (name, values)) with a mix of indented, scored and comment items
+    """
+    rng = random.Random(seed)
+    headers = []
+    for i in range(columns):
+        kind = i % 4
+        if kind == 0:
+            headers.append(">Pt %d\n(1-2)\n/.5" % i)
+        elif kind == 1:
+            headers.append(">>Pt %d sub /1.25" % i)
+        elif kind == 2:
+            headers.append(">Comment for Pt %d" % i)
+        else:
+            headers.append("Pt %d Total /6" % i)
+
+    values = ["", "0", "0.25", "5.5", "Good job!", "Good start,\nbut see line two\nand three"]
+    sheet = [("Last%d, First%d" % (r, r), [rng.choice(values) for _ in range(columns)]) for r in range(rows)]
+    return headers, sheet
+
+
+def main():
+    parser = ArgumentParser(prog="bench_report_template.py",
+                            description="Benchmark report rendering: per-cell insert_info vs. ReportTemplate.")
+    parser.add_argument("--columns", type=int, default=200, help="number of grading items on the sheet")
+    parser.add_argument("--rows", type=int, default=5000, help="number of students on the sheet")
+    args = parser.parse_args()
+
+    headers, sheet = make_sheet(args.columns, args.rows)
+    items = [GradingItem(header) for header in headers]
+    assignment_name = "Homework 1\ndue Fri"
+
+    start = time.perf_counter()
+    legacy = [legacy_report(items, assignment_name, name, values) for name, values in sheet]
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    template = ReportTemplate(items, REPORT_TITLE, assignment_name)
+    compiled = template.render_all(sheet)
+    compiled_time = time.perf_counter() - start
+
+    if legacy != compiled:
+        raise RuntimeError("ReportTemplate output differs from the previous report generation.")
+
+    print("Sheet: %d columns x %d rows, reports identical" % (args.columns, args.rows))
+    print("Per-cell insert_info: %8.3f s" % legacy_time)
+    print("ReportTemplate:       %8.3f s (%.1fx)" % (compiled_time, legacy_time / compiled_time))
+
+
+if __name__ == "__main__":
+    main()
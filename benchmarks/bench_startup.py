@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""bench_startup.py: measure start-up time of the command line tools, and check with -X importtime that light code
+paths do not import heavy dependencies (pandas, nameparser). Exits with status 1 if any of them does.
+Run from project root: python benchmarks/bench_startup.py [--repeat 5]
+"""
+
+# Built-in/Generic Imports
+import os
+import re
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser
+
+__author__ = 'Yonglin Wang'
+__version__ = '0.1.0'
+__maintainer__ = 'Yonglin Wang'
+__email__ = 'yonglinw@brandeis.edu'
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# ###Modules that must not be imported on light code paths
+HEAVY_MODULES = ("pandas", "numpy", "nameparser")
+
+# ###Light code paths: (description, python arguments)
+COMMANDS = [
+    ("import grades_out", ["-c", "import grades_out"]),
+    ("import name_convert", ["-c", "import name_convert"]),
+    ("grades_out.py --help", ["grades_out.py", "--help"]),
+    ("job_runner.py --help", ["job_runner.py", "--help"]),
+    ("GradingItem preview", ["-c", "from grading_item import GradingItem; GradingItem('>Pt 1 /1').insert_info('1')"]),
+]
+
+# line of -X importtime output: "import time: self [us] | cumulative | imported package"
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def run(args: list) -> tuple:
+    """
+    :return: (wall time in seconds, {top-level module: cumulative import time in us}, set of all imported modules)
+    """
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime"] + args, cwd=PROJECT_ROOT,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True)
+    elapsed = time.perf_counter() - start
+
+    top_level, imported = {}, set()
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            imported.add(match.group(4).split(".")[0])
+            # only one space of indentation means imported directly by the script
+            if len(match.group(3)) == 1:
+                top_level[match.group(4)] = int(match.group(2))
+    return elapsed, top_level, imported
+
+
+def main():
+    parser = ArgumentParser(prog="bench_startup.py",
+                            description="Benchmark start-up time and check for heavy imports on light code paths.")
+    parser.add_argument("--repeat", type=int, default=5, help="number of runs of each command; the fastest is kept")
+    args = parser.parse_args()
+
+    regressions = []
+    for description, command in COMMANDS:
+        runs = [run(command) for _ in range(args.repeat)]
+        elapsed, top_level, imported = min(runs, key=lambda r: r[0])
+        heavy = sorted(imported.intersection(HEAVY_MODULES))
+        slowest = sorted(top_level.items(), key=lambda item: -item[1])[:3]
+
+        print("%-22s %7.1f ms  slowest imports: %s" % (description, elapsed * 1000, ", ".join(
+            "%s %.1f ms" % (module, us / 1000) for module, us in slowest)))
+        if heavy:
+            regressions.append("%s imports %s" % (description, ", ".join(heavy)))
+
+    if regressions:
+        print("Heavy imports found on light code paths:\n\t" + "\n\t".join(regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
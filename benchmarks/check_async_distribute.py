@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""check_async_distribute.py: check the guarantees of the asyncio distribution engine (async_distribute.py) against a
+throttled stand-in for write_report. Some students' writes fail with a transient error a few times before succeeding,
+and others always fail with a permanent or transient error. Checks that every report is saved with the right content
+or reported as failed for its own student, that transient errors are retried and permanent ones are not, that no more
+writes than the concurrency limit are in flight, and that stopping early still waits for writes already started.
+Every broken guarantee is listed with what was expected and what was found, and the script then exits with status 1.
+Run from project root: python benchmarks/check_async_distribute.py [--students 120] [--concurrency 4]
+"""
+
+# Built-in/Generic Imports
+import asyncio
+import errno
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Own modules
+import synthetic
+from async_distribute import AsyncDistributor, RETRIES
+from bench_async_distribute import clear_reports
+from grades_out import GradesOut, write_report
+
+__author__ = 'Yonglin Wang'
+__version__ = '0.1.0'
+__maintainer__ = 'Yonglin Wang'
+__email__ = 'yonglinw@brandeis.edu'
+
+
+class ScriptedWriter:
+    """
+    write_report with a short delay, failing for chosen report paths: flaky ones fail with EAGAIN a given number of
+    times before succeeding, broken ones always fail with the given error
+    """
+
+    def __init__(self, flaky: dict, broken: dict, latency=0.002):
+        """
+        :param flaky: {path: number of EAGAIN failures before the write succeeds}
+        :param broken: {path: exception raised on every attempt}
+        """
+        self.flaky = dict(flaky)
+        self.broken = broken
+        self.latency = latency
+        self.attempts = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, path: str, report: str):
+        with self._lock:
+            self.attempts[path] = self.attempts.get(path, 0) + 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.latency)
+            if path in self.broken:
+                raise self.broken[path]
+            with self._lock:
+                if self.flaky.get(path, 0) > 0:
+                    self.flaky[path] -= 1
+                    raise OSError(errno.EAGAIN, "Server busy", path)
+            write_report(path, report)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def expect(errors: list, what: str, expected, actual):
+    """
+    add an error to errors if actual differs from expected
+    """
+    if actual != expected:
+        errors.append("%s: expected %s, got %s" % (what, expected, actual))
+
+
+def first_difference(expected: str, actual: str) -> str:
+    """
+    :return: line number and both versions of the first line that differs between two reports
+    """
+    expected_lines, actual_lines = expected.splitlines(), actual.splitlines()
+    for i in range(max(len(expected_lines), len(actual_lines))):
+        expected_line = expected_lines[i] if i < len(expected_lines) else "<end of report>"
+        actual_line = actual_lines[i] if i < len(actual_lines) else "<end of report>"
+        if expected_line != actual_line:
+            return "line %d: expected %r, got %r" % (i + 1, expected_line, actual_line)
+    return "line endings differ"
+
+
+def check_run(go: GradesOut, concurrency: int, errors: list) -> tuple:
+    """
+    distribute all reports with some writes failing, adding any broken guarantee to errors
+    :return: (number of results, permanent failures, transient failures, transient errors retried)
+    """
+    label = "concurrency %d" % concurrency
+    names = list(go.all_info)
+    paths = dict((grading_name, go.report_path(grading_name)) for grading_name in names)
+    flaky = dict((paths[grading_name], 1 + i % RETRIES) for i, grading_name in enumerate(names[0::7]))
+    permanent = set(names[3::11])
+    transient = set(names[5::13]).difference(permanent)
+    failing = permanent.union(transient)
+    broken = dict([(paths[grading_name], PermissionError(errno.EACCES, "Permission denied", paths[grading_name]))
+                   for grading_name in permanent] +
+                  [(paths[grading_name], OSError(errno.EIO, "Connection reset", paths[grading_name]))
+                   for grading_name in transient])
+    writer = ScriptedWriter(flaky, broken)
+
+    clear_reports(go)
+    seen = []
+    results = asyncio.run(AsyncDistributor(go, concurrency=concurrency, backoff=0.001, writer=writer).run(
+        on_result=seen.append))
+
+    # one result per student, each passed to on_result as soon as it is known
+    expect(errors, "%s: results" % label, len(names), len(results))
+    missing = set(names).difference(result.grading_name for result in results)
+    if missing or len(set(result.grading_name for result in results)) != len(results):
+        errors.append("%s: results not one per student, missing: %s" % (label, "; ".join(sorted(missing)) or "none"))
+    if seen != results:
+        errors.append("%s: on_result got %d results, %d in the order returned" % (
+            label, len(seen), sum(a == b for a, b in zip(seen, results))))
+    if writer.max_in_flight > concurrency:
+        errors.append("%s: writes in flight at once: expected at most %d, got %d" % (label, concurrency,
+                                                                                   writer.max_in_flight))
+
+    for result in results:
+        grading_name, path = result.grading_name, result.path
+        what = "%s: %s" % (label, grading_name)
+        expect(errors, "%s: path" % what, paths.get(grading_name), path)
+        if grading_name in permanent:
+            # reported for this student, without retrying
+            expect(errors, "%s: error" % what, "PermissionError", (result.error or "None").split(":")[0])
+            expect(errors, "%s: attempts" % what, 1, result.attempts)
+            expect(errors, "%s: writes" % what, 1, writer.attempts.get(path, 0))
+        elif grading_name in transient:
+            # retried until retries run out, then reported for this student
+            expect(errors, "%s: error" % what, "OSError", (result.error or "None").split(":")[0])
+            expect(errors, "%s: attempts" % what, RETRIES + 1, result.attempts)
+            expect(errors, "%s: writes" % what, RETRIES + 1, writer.attempts.get(path, 0))
+        else:
+            # saved, after as many attempts as the writer failed
+            expect(errors, "%s: error" % what, None, result.error)
+            expect(errors, "%s: attempts" % what, 1 + flaky.get(path, 0), result.attempts)
+
+    # saved reports on disk, with the content generate_report gives
+    saved = [grading_name for grading_name in names if os.path.exists(paths[grading_name])]
+    expect(errors, "%s: reports on disk" % label, len(names) - len(failing), len(saved))
+    for grading_name in saved:
+        if grading_name in failing:
+            errors.append("%s: %s: report exists although its write failed" % (label, grading_name))
+            continue
+        with open(paths[grading_name]) as f:
+            actual = f.read()
+        expected = go.generate_report(grading_name.replace(",", ", "), go.all_info[grading_name])
+        if actual != expected:
+            errors.append("%s: %s: wrong report, %s" % (label, grading_name, first_difference(expected, actual)))
+
+    # through GradesOut, failures are summarized per student
+    clear_reports(go)
+    original = go.save_report
+    go.save_report = writer
+    writer.flaky, writer.attempts = {}, {}
+    try:
+        num_saved = go.distribute_grade_async(concurrency)
+    finally:
+        go.save_report = original
+    reported = set(go.failed_reports)
+    if reported != failing:
+        errors.append("%s: failed_reports: %d students, expected %d; missing: %s; unexpected: %s" % (
+            label, len(reported), len(failing), "; ".join(sorted(failing - reported)) or "none",
+            "; ".join(sorted(reported - failing)) or "none"))
+    expect(errors, "%s: reports saved by distribute_grade_async" % label, len(names) - len(failing), num_saved)
+    return len(results), len(permanent), len(transient), sum(flaky.values())
+
+
+def check_early_stop(go: GradesOut, concurrency: int, errors: list):
+    """
+    stopping after the first result must still wait for the writes already started
+    """
+    label = "concurrency %d, stopped early" % concurrency
+    clear_reports(go)
+    writer = ScriptedWriter({}, {}, latency=0.01)
+
+    async def first_result():
+        results = AsyncDistributor(go, concurrency=concurrency, writer=writer).results()
+        async for result in results:
+            await results.aclose()
+            return result
+
+    asyncio.run(first_result())
+    expect(errors, "%s: writes still running" % label, 0, writer.in_flight)
+    started = sum(writer.attempts.values())
+    if not 1 <= started <= 2 * concurrency:
+        errors.append("%s: writes started: expected 1 to %d, got %d" % (label, 2 * concurrency, started))
+    saved = sum(os.path.exists(go.report_path(grading_name)) for grading_name in go.all_info)
+    expect(errors, "%s: reports on disk" % label, started, saved)
+
+
+def main():
+    parser = ArgumentParser(prog="check_async_distribute.py",
+                            description="Check the asyncio distribution engine against a throttled, failing stand-in "
+                                        "for write_report.")
+    parser.add_argument("--students", type=int, default=120, help="number of students")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16],
+                        help="concurrency limits to check")
+    args = parser.parse_args()
+
+    cwd = os.getcwd()
+    root = tempfile.mkdtemp(prefix="grades_out_check_")
+    errors = []
+    try:
+        synthetic.make_course(root, args.students, 10)
+        os.chdir(root)
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            go = GradesOut(synthetic.LATTE_FOLDER, synthetic.SHEET_FILE + ".csv", assn_alias="A1", verbose=False)
+
+        for concurrency in args.concurrency:
+            found = len(errors)
+            results, permanent, transient, retried = check_run(go, concurrency, errors)
+            check_early_stop(go, concurrency, errors)
+            print("Concurrency %d: %d results, %d permanent and %d transient failures, %d transient errors retried: "
+                  "%s" % (concurrency, results, permanent, transient, retried,
+                          "%d errors" % (len(errors) - found) if len(errors) > found else "OK"))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(root, ignore_errors=True)
+
+    if errors:
+        print("Errors:\n\t" + "\n\t".join(errors))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
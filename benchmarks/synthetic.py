@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""synthetic.py: generate a synthetic course for benchmarks: a LATTE export folder, the name conversion file and the
+matching grading sheet (.csv and/or .xlsx), laid out like example_folders/ and example_gradesheet.csv at any size.
+Run from project root: python benchmarks/synthetic.py <output folder> [--students 1000] [--columns 40] [--xlsx]
+"""
+
+# Built-in/Generic Imports
+import csv
+import os
+import random
+import string
+import sys
+from argparse import ArgumentParser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Own modules
+import name_convert
+
+__author__ = 'Yonglin Wang'
+__version__ = '0.1.0'
+__maintainer__ = 'Yonglin Wang'
+__email__ = 'yonglinw@brandeis.edu'
+
+# ###Name of LATTE parent folder, grading sheet (without suffix) and sheet name in the generated course
+LATTE_FOLDER = "latte"
+SHEET_FILE = "grading_sheet"
+SHEET_NAME = "A1.print"
+ASSIGNMENT_NAME = "Homework 1, due Fri 2-28\n(Extended from Wed 2-26)"
+
+# ###Cell values of each kind of column, picked at random
+SCORE_VALUES = ["", "0", "0.25", "0.5", "1"]
+COMMENT_VALUES = ["", "", "Good job!", "Missing the base case.",
+                  "Good start,\nbut see line two\nand line three for what is missing."]
+
+
+def make_names(n: int, seed=0) -> list:
+    """
+    generate n unique (first name, last name) pairs using letters only, as matched by name_convert.FOLDER_NAME_REGEX
+    """
+    rng = random.Random(seed)
+    names = set()
+    while len(names) < n:
+        names.add(("".join(rng.choice(string.ascii_lowercase) for _ in range(7)).title(),
+                   "".join(rng.choice(string.ascii_lowercase) for _ in range(9)).title()))
+    return sorted(names)
+
+
+def make_headers(columns: int) -> list:
+    """
+    generate item headers in the layout of example_gradesheet.csv: groups of ">>" sub-items with "/N" scores under a
+    ">" item, followed by a comment column, with a total and general comments at the end
+    :param columns: number of item columns, not counting the Name column
+    """
+    headers = []
+    part = 0
+    while len(headers) < columns - 2:
+        part += 1
+        headers.append(">Pt %d\n/%d" % (part, 3))
+        headers.extend(">>Pt %d\n(%d-%d)\n/%s" % (part, 2 * sub + 1, 2 * sub + 2, (".5", "1", ".75")[sub])
+                       for sub in range(3))
+        headers.append(">>Comments on Pt %d" % part)
+    headers = headers[:max(columns - 2, 0)]
+    return headers + ["Total\n/%d" % (3 * part), "Grader Comments"][:columns]
+
+
+def make_rows(names: list, headers: list, seed=0) -> list:
+    """
+    :return: list of (grading name, list of cell values) for the given (first name, last name) pairs
+    """
+    rng = random.Random(seed)
+    comment_columns = [not header.rstrip().split("\n")[-1].startswith("/") for header in headers]
+    return [("%s,%s" % (last, first), [rng.choice(COMMENT_VALUES if is_comment else SCORE_VALUES)
+                                       for is_comment in comment_columns])
+            for first, last in names]
+
+
+def write_latte_tree(root: str, names: list):
+    """
+    create one empty <First Last>_<digits>_assignsubmission_file_ folder per student under root
+    """
+    os.makedirs(root, exist_ok=True)
+    for i, (first, last) in enumerate(names):
+        os.makedirs(os.path.join(root, "%s %s_%d_assignsubmission_file_" % (first, last, 2898000 + i)),
+                    exist_ok=True)
+
+
+def write_conversion_file(path: str, names: list):
+    """
+    write the name conversion file name_convert.py would generate for the given names
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, lineterminator=os.linesep)
+        writer.writerow([name_convert.LATTE_COL_NAME, name_convert.GRADING_COL_NAME])
+        writer.writerows(sorted((("%s %s" % (first, last), "%s,%s" % (last, first)) for first, last in names),
+                                key=lambda pair: pair[1]))
+
+
+def write_csv_sheet(path: str, headers: list, rows: list):
+    """
+    write grading sheet with the assignment name in A1 and the header row in row 2
+    """
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow([ASSIGNMENT_NAME] + [""] * len(headers))
+        writer.writerow(["Name"] + headers)
+        writer.writerows([grading_name] + values for grading_name, values in rows)
+
+
+def write_xlsx_sheet(path: str, headers: list, rows: list):
+    """
+    write the same grading sheet as write_csv_sheet to SHEET_NAME of a .xlsx file, with scores as numbers
+    """
+    # openpyxl is only needed for .xlsx sheets
+    from openpyxl import Workbook
+
+    def cell(value):
+        try:
+            return float(value)
+        except ValueError:
+            return value or None
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(SHEET_NAME)
+    sheet.append([ASSIGNMENT_NAME])
+    sheet.append(["Name"] + headers)
+    for grading_name, values in rows:
+        sheet.append([grading_name] + [cell(value) for value in values])
+    workbook.save(path)
+
+
+def make_course(root: str, students: int, columns: int, xlsx=False, seed=0) -> dict:
+    """
+    generate a whole synthetic course under root
+    :return: {"latte": LATTE parent folder, "conversion": conversion file, "csv": .csv sheet, "xlsx": .xlsx sheet or
+    None, "names": list of (first name, last name)}
+    """
+    names = make_names(students, seed=seed)
+    headers = make_headers(columns)
+    rows = make_rows(names, headers, seed=seed)
+
+    course = {"latte": os.path.join(root, LATTE_FOLDER),
+              "conversion": os.path.join(root, name_convert.OUTPUT_PATH),
+              "csv": os.path.join(root, SHEET_FILE + ".csv"),
+              "xlsx": os.path.join(root, SHEET_FILE + ".xlsx") if xlsx else None,
+              "names": names}
+
+    write_latte_tree(course["latte"], names)
+    write_conversion_file(course["conversion"], names)
+    write_csv_sheet(course["csv"], headers, rows)
+    if xlsx:
+        write_xlsx_sheet(course["xlsx"], headers, rows)
+    return course
+
+
+def main():
+    parser = ArgumentParser(prog="synthetic.py",
+                            description="Generate a synthetic LATTE export folder, name conversion file and grading "
+                                        "sheet for benchmarks.")
+    parser.add_argument("output_folder", help="folder to generate the course in; use it as project root when running "
+                                              "grades_out.py on it.")
+    parser.add_argument("--students", type=int, default=1000, help="number of students")
+    parser.add_argument("--columns", type=int, default=40, help="number of grading items on the sheet")
+    parser.add_argument("--xlsx", action="store_true", help="also write the grading sheet as .xlsx (requires openpyxl)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed; the same seed gives the same course")
+    args = parser.parse_args()
+
+    course = make_course(args.output_folder, args.students, args.columns, xlsx=args.xlsx, seed=args.seed)
+    print("Generated %d students under %s, grading sheet %s%s" % (
+        len(course["names"]), course["latte"], course["csv"],
+        " and %s (sheet %s)" % (course["xlsx"], SHEET_NAME) if course["xlsx"] else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""csv_sheet.py: row-by-row reader for .csv grading sheets, using only the standard library
+Applies the same cleaning rules as GradesOut.normalize_dataframe (empty rows and columns, header row in A1 or A2, rows
+without actual names) while keeping only one row in memory at a time.
+"""
+
+# Built-in/Generic Imports
+import csv
+
+__author__ = 'Yonglin Wang'
+__version__ = '0.1.0'
+__maintainer__ = 'Yonglin Wang'
+__email__ = 'yonglinw@brandeis.edu'
+
+# ###Cell values read as missing, same as pandas.read_csv defaults; these show up as empty strings in reports
+CSV_NA_VALUES = frozenset(['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+                           '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'])
+
+
+def read_csv_rows(f_path: str):
+    """
+    generate rows of a .csv file as lists of strings, with missing values as empty strings. Blank lines are skipped
+    and rows shorter than the first row are padded, as done by pandas.read_csv.
+    :param f_path: path to .csv file
+    """
+    # utf-8-sig drops the byte order mark that Excel and Google Sheets may add
+    with open(f_path, newline="", encoding="utf-8-sig") as f:
+        width = None
+        for line_num, row in enumerate(csv.reader(f), 1):
+            if not row:
+                continue
+            if width is None:
+                width = len(row)
+            elif len(row) > width:
+                raise ValueError("Expected %d fields in line %d of %s, saw %d." % (width, line_num, f_path, len(row)))
+
+            yield [("" if value in CSV_NA_VALUES else value) for value in row] + [""] * (width - len(row))
+
+
+class CsvSheet:
+    """
+    normalized view of a .csv grading sheet. Iterating over it reads the file again and yields
+    (student name on sheet, tuple of values in item order) for each student row.
+    """
+
+    def __init__(self, f_path: str, name_col: str, names_to_drop: set, default_assignment_name: str):
+        """
+        :param f_path: path to .csv grading sheet
+        :param name_col: header of column containing student names, e.g. grades_out.NAME_COL
+        :param names_to_drop: values in name column whose rows are skipped, e.g. grades_out.NAME_VALUES_TO_DROP
+        :param default_assignment_name: assignment name if Cell A1 is the name column header
+        """
+        self.f_path = f_path
+        self.names_to_drop = names_to_drop
+
+        rows = read_csv_rows(f_path)
+        first_row = next(rows, None)
+        second_row = next(rows, None)
+
+        # check if Name column is in A1 or A2
+        if first_row and first_row[0].strip() == name_col:
+            self.header_index = 0
+            header = first_row
+            self.assignment_name = default_assignment_name
+        elif second_row and second_row[0].strip() == name_col:
+            self.header_index = 1
+            header = second_row
+            self.assignment_name = first_row[0].strip()
+        # if Name isn't in A1 or A2, raise error.
+        else:
+            raise KeyError("Cannot find column \"%s\" containing student names. "
+                           "Please make sure either Cell A1 or A2 is name as \"%s\"." % (name_col, name_col))
+        rows.close()
+
+        # make sure there's no whitespace
+        header[0] = name_col
+
+        # columns with empty headers are only kept if they have a value in any row, which takes a pass over the file
+        empty_headers = set(i for i, value in enumerate(header) if not value)
+        if empty_headers:
+            for row in self.data_rows():
+                empty_headers.difference_update([i for i in empty_headers if row[i]])
+                if not empty_headers:
+                    break
+
+        self.columns = [i for i in range(len(header)) if i not in empty_headers]
+        self.header = [header[i] for i in self.columns]
+
+    def data_rows(self):
+        """
+        generate all rows below the header row, as read from file
+        """
+        rows = read_csv_rows(self.f_path)
+        for _ in range(self.header_index + 1):
+            next(rows)
+        return rows
+
+    def __iter__(self):
+        value_columns = self.columns[1:]
+        for row in self.data_rows():
+            # skip rows without actual names (e.g. those containing #REF! or ""), including empty rows
+            if row[0] in self.names_to_drop:
+                continue
+            yield row[0], tuple(row[i] for i in value_columns)
@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""dir_snapshot.py: in-memory snapshot of a LATTE parent folder, kept across runs under conv/
+Records the student folders under the LATTE parent folder and the files in each of them, so that folder matching and
+the overwrite check need no directory scans or per-report stat calls. On the next run, only folders whose modification
+time changed are scanned again.
+"""
+
+# Built-in/Generic Imports
+import json
+import os
+import threading
+from argparse import ArgumentParser
+from hashlib import sha1
+
+# Own modules
+from atomic_write import atomic_write
+
+__author__ = 'Yonglin Wang'
+__version__ = '0.1.0'
+__maintainer__ = 'Yonglin Wang'
+__email__ = 'yonglinw@brandeis.edu'
+
+# ###Folder of saved snapshots, one file per LATTE parent folder
+SNAPSHOT_DIR = "conv/snapshots"
+
+# ###Seconds between checks for changes in watch mode
+WATCH_INTERVAL = 2.0
+
+
+def scan_files(path: str) -> list:
+    return [f.name for f in os.scandir(path) if f.is_file()]
+
+
+class DirectorySnapshot:
+
+    def __init__(self, root: str):
+        self.root = root
+        self.root_mtime_ns = None
+        self.root_files = set()
+        # {folder name: [folder modification time, set of file names]}
+        self.folders = {}
+        self.rescanned = 0
+        self._lock = threading.RLock()
+
+    @property
+    def path(self) -> str:
+        return os.path.join(SNAPSHOT_DIR, "%s.json" % sha1(os.path.abspath(self.root).encode("utf-8")).hexdigest())
+
+    @classmethod
+    def load(cls, root: str):
+        """
+        load snapshot of root saved by a previous run, if any, and bring it up to date
+        :param root: path to LATTE parent folder
+        :return: DirectorySnapshot of root
+        """
+        snapshot = cls(root)
+        try:
+            with open(snapshot.path, encoding="utf-8") as f:
+                saved = json.load(f)
+            snapshot.root_mtime_ns = saved["root_mtime_ns"]
+            snapshot.root_files = set(saved["root_files"])
+            snapshot.folders = dict((name, [entry["mtime_ns"], set(entry["files"])])
+                                    for name, entry in saved["folders"].items())
+        except (FileNotFoundError, ValueError, KeyError):
+            pass
+        snapshot.refresh()
+        return snapshot
+
+    def save(self):
+        with self._lock:
+            saved = {"root": os.path.abspath(self.root), "root_mtime_ns": self.root_mtime_ns,
+                     "root_files": sorted(self.root_files),
+                     "folders": dict((name, {"mtime_ns": mtime_ns, "files": sorted(files)})
+                                     for name, (mtime_ns, files) in self.folders.items())}
+        os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+        with atomic_write(self.path, encoding="utf-8") as f:
+            json.dump(saved, f, ensure_ascii=False)
+
+    def refresh(self) -> bool:
+        """
+        bring snapshot up to date, scanning the parent folder only if its modification time changed, and each
+        student folder only if its own modification time changed
+        :return: whether anything changed
+        """
+        with self._lock:
+            changed = False
+            root_mtime_ns = os.stat(self.root).st_mtime_ns
+
+            # folders were added, removed or renamed, or files were saved directly under the parent folder
+            if root_mtime_ns != self.root_mtime_ns:
+                folders, root_files = {}, set()
+                for f in os.scandir(self.root):
+                    if f.is_dir():
+                        # hidden directories are never LATTE folders
+                        if not f.name.startswith("."):
+                            folders[f.name] = self.folders.get(f.name, [None, set()])
+                    elif f.is_file():
+                        root_files.add(f.name)
+                self.folders, self.root_files, self.root_mtime_ns = folders, root_files, root_mtime_ns
+                changed = True
+
+            for name, entry in self.folders.items():
+                folder_path = os.path.join(self.root, name)
+                mtime_ns = os.stat(folder_path).st_mtime_ns
+                if mtime_ns != entry[0]:
+                    entry[0], entry[1] = mtime_ns, set(scan_files(folder_path))
+                    self.rescanned += 1
+                    changed = True
+
+            return changed
+
+    def folder_paths(self) -> list:
+        """
+        :return: paths of all student folders, as os.scandir(root) would give them
+        """
+        with self._lock:
+            return [os.path.join(self.root, name) for name in self.folders]
+
+    def has_file(self, folder_path: str, file_name: str) -> bool:
+        """
+        :param folder_path: path to a student folder, or to the parent folder itself
+        :return: whether the file exists in the folder, according to the snapshot
+        """
+        with self._lock:
+            if os.path.normpath(folder_path) == os.path.normpath(self.root):
+                return file_name in self.root_files
+            entry = self.folders.get(os.path.basename(os.path.normpath(folder_path)))
+            return entry is not None and file_name in entry[1]
+
+    def current_folders(self, folder_paths) -> set:
+        """
+        find the folders still as recorded, i.e. not changed by anyone since the snapshot was last refreshed. Call it
+        right before saving files into the folders, and pass the result to record_files.
+        :param folder_paths: student folders or the parent folder
+        :return: set of normalized paths of the folders whose modification time is the recorded one
+        """
+        with self._lock:
+            current = set()
+            for folder_path in set(os.path.normpath(path) for path in folder_paths):
+                if folder_path == os.path.normpath(self.root):
+                    recorded = self.root_mtime_ns
+                else:
+                    recorded = self.folders.get(os.path.basename(folder_path), [None])[0]
+                if recorded is not None and os.stat(folder_path).st_mtime_ns == recorded:
+                    current.add(folder_path)
+            return current
+
+    def record_files(self, file_paths, current=()):
+        """
+        record files saved by this program, so that saving them does not cause a rescan on the next run
+        :param file_paths: iterable of paths of saved files
+        :param current: folders found unchanged by current_folders before the files were saved. Only their
+        modification times are advanced; other folders keep their old ones, so that changes made there by others are
+        still found by the next refresh.
+        """
+        with self._lock:
+            for file_path in file_paths:
+                folder_path, file_name = os.path.split(file_path)
+                folder_path = os.path.normpath(folder_path)
+                mtime_ns = os.stat(folder_path).st_mtime_ns if folder_path in current else None
+                if folder_path == os.path.normpath(self.root):
+                    self.root_files.add(file_name)
+                    if mtime_ns is not None:
+                        self.root_mtime_ns = mtime_ns
+                else:
+                    entry = self.folders.setdefault(os.path.basename(folder_path), [None, set()])
+                    if mtime_ns is not None:
+                        entry[0] = mtime_ns
+                    entry[1].add(file_name)
+
+    def watch(self, interval=WATCH_INTERVAL, on_change=None) -> threading.Event:
+        """
+        keep snapshot up to date in a background thread, checking modification times every interval seconds
+        :param on_change: called with the snapshot whenever a check finds changes
+        :return: event to set to stop watching
+        """
+        stop = threading.Event()
+
+        def poll():
+            while not stop.wait(interval):
+                if self.refresh():
+                    self.save()
+                    if on_change:
+                        on_change(self)
+
+        threading.Thread(target=poll, daemon=True).start()
+        return stop
+
+
+def main():
+    parser = ArgumentParser(prog="dir_snapshot.py",
+                            description="Create or update the snapshot of a LATTE parent folder used by "
+                                        "\"grades_out.py --snapshot\" and \"name_convert.py --snapshot\".")
+    parser.add_argument("student_folder", help="path to parent folder whose immediate subdirectories are student "
+                                               "LATTE folders.")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running and update the snapshot whenever folders change, until interrupted "
+                             "(e.g. with Ctrl+C).")
+    parser.add_argument("--interval", type=float, default=WATCH_INTERVAL,
+                        help="seconds between checks for changes in watch mode (default %.1f)." % WATCH_INTERVAL)
+    args = parser.parse_args()
+
+    snapshot = DirectorySnapshot.load(args.student_folder)
+    snapshot.save()
+    print("Snapshot of %s saved at %s: %d folders, %d rescanned." %
+          (args.student_folder, snapshot.path, len(snapshot.folders), snapshot.rescanned))
+
+    if args.watch:
+        def report(changed):
+            print("Snapshot updated: %d folders, %d rescanned in total." % (len(changed.folders), changed.rescanned))
+
+        print("Watching %s for changes. Press Ctrl+C to stop." % args.student_folder)
+        stop = snapshot.watch(interval=args.interval, on_change=report)
+        try:
+            while not stop.wait(3600):
+                pass
+        except KeyboardInterrupt:
+            stop.set()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""folder_index.py: hash index over student LATTE folders for constant-time name-to-folder lookups
+Requires: a structured folder of student submissions (obtained from LATTE)
+"""
+
+# Built-in/Generic Imports
+import os
+import re
+from bisect import bisect_left
+from collections import defaultdict
+
+# Own modules
+from name_convert import FOLDER_NAME_REGEX
+
+__author__ = 'Yonglin Wang'
+__version__ = '0.1.0'
+__maintainer__ = 'Yonglin Wang'
+__email__ = 'yonglinw@brandeis.edu'
+
+# ###Same folder pattern as name_convert.FOLDER_NAME_REGEX, with the participant ID digits captured as well
+FOLDER_ID_REGEX = re.compile(FOLDER_NAME_REGEX.replace(r"_\d+_", r"_(\d+)_"))
+
+# ###LATTE name followed by (the start of) a participant ID, as entered by hand to tell apart students of the same name
+NAME_ID_REGEX = re.compile(r"([ a-zA-Z'-]*)_(\d+)")
+
+
+class FolderIndex:
+    """
+    index of LATTE submission folders, parsed once into {LATTE name: [folder paths]} and {participant ID: [folder
+    paths]}. Folder names that do not follow <name>_<digits>_assignsubmission_file_ are kept aside and only scanned
+    when a name cannot be found in the index. Lookups give the same folders as matching the name as a substring of
+    every folder path, as GradesOut used to, so that names that are part of other names still match several folders.
+    """
+
+    def __init__(self, folder_paths):
+        self.by_name = defaultdict(list)
+        self.by_id = defaultdict(list)
+        self.unparsed = []
+
+        for path in folder_paths:
+            # only names that are the whole folder name are indexed, so that a name is found in no other part of it
+            match = FOLDER_ID_REGEX.fullmatch(os.path.basename(path))
+            if match:
+                self.by_name[match.group(1)].append(path)
+                self.by_id[match.group(2)].append(path)
+            else:
+                self.unparsed.append(path)
+
+        # names by the three-letter sequences in them, to find the names containing a given name
+        self.by_trigram = defaultdict(set)
+        for name in self.by_name:
+            for i in range(len(name) - 2):
+                self.by_trigram[name[i:i + 3]].add(name)
+        self.ids = sorted(self.by_id)
+        # parts of indexed folder paths other than names and IDs; a name found in them is in every folder path
+        self.shared_parts = set(os.path.dirname(path) for paths in self.by_name.values() for path in paths)
+        self.shared_parts.add("_assignsubmission_file_")
+
+    @classmethod
+    def from_directory(cls, latte_path: str):
+        """
+        build index from all immediate subdirectories under latte_path, with full relative path
+        :param latte_path: path to parent folder of student LATTE folders
+        :return: FolderIndex over the subdirectories
+        """
+        # hidden directories are never LATTE folders (e.g. staged_commit.STAGING_DIR_NAME)
+        return cls(f.path for f in os.scandir(latte_path) if f.is_dir() and not f.name.startswith("."))
+
+    def __len__(self):
+        return sum(len(paths) for paths in self.by_name.values()) + len(self.unparsed)
+
+    def lookup(self, latte_name: str) -> list:
+        """
+        return all folder paths containing the given LATTE name, e.g. "Mary Lee" matches folders of "Mary Lee" and
+        "Anne-Mary Lee". Names entered with (the start of) a participant ID, e.g. "Mary Lee_2898", are matched through
+        the ID. Other names that are not exact folder names (e.g. manually edited conversion entries) fall back to the
+        substring match previously used by GradesOut.
+        :param latte_name: name as seen on LATTE folder, e.g. "Mary Lee"
+        :return: list of matching folder paths, possibly empty
+        """
+        unparsed = [d for d in self.unparsed if latte_name in d]
+        if any(latte_name in part for part in self.shared_parts):
+            return [d for paths in self.by_name.values() for d in paths if latte_name in d] + unparsed
+
+        if latte_name in self.by_name:
+            return [d for name in self.names_containing(latte_name) for d in self.by_name[name]] + unparsed
+
+        match = NAME_ID_REGEX.fullmatch(latte_name)
+        if match:
+            return [d for d in self.lookup_id(match.group(2), prefix=True) if latte_name in d] + unparsed
+
+        return [d for paths in self.by_name.values() for d in paths if latte_name in d] + unparsed
+
+    def names_containing(self, latte_name: str) -> list:
+        """
+        :return: LATTE names of folders that contain the given name, starting with the name itself if it is one
+        """
+        trigrams = [latte_name[i:i + 3] for i in range(len(latte_name) - 2)]
+        if trigrams:
+            candidates = min((self.by_trigram.get(trigram, ()) for trigram in trigrams), key=len)
+        else:
+            candidates = self.by_name
+        names = sorted(name for name in candidates if latte_name in name and name != latte_name)
+        return ([latte_name] if latte_name in self.by_name else []) + names
+
+    def lookup_id(self, participant_id, prefix=False) -> list:
+        """
+        return all folder paths with the given LATTE participant ID (the digits after the name)
+        :param participant_id: int or digit string
+        :param prefix: also return folders whose ID starts with the given digits
+        :return: list of matching folder paths, possibly empty
+        """
+        participant_id = str(participant_id)
+        if not prefix:
+            return list(self.by_id.get(participant_id, []))
+
+        start = end = bisect_left(self.ids, participant_id)
+        while end < len(self.ids) and self.ids[end].startswith(participant_id):
+            end += 1
+        return [d for i in self.ids[start:end] for d in self.by_id[i]]
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""grade_stats.py: class-level statistics of every scored item on a grading sheet
+Scored items are those with a total score in their header (e.g. "Pt 1 (1-2) /.5"), as parsed into GradingItem.suffix.
+All score columns are converted to one numeric array at once, and the count, mean, median, standard deviation, minimum,
+maximum and histogram of every item are computed over whole columns. Cells that are not numbers (e.g. empty or
+"excused") are left out of an item's statistics.
+"""
+
+# Built-in/Generic Imports
+import csv
+import json
+import os
+import warnings
+from collections import namedtuple
+
+# Own modules
+from report_template import ReportTemplate
+
+__author__ = 'Yonglin Wang'
+__version__ = '0.1.0'
+__maintainer__ = 'Yonglin Wang'
+__email__ = 'yonglinw@brandeis.edu'
+
+# ###Number of histogram bins between 0 and the maximum score of an item; scores above the maximum are counted apart
+HISTOGRAM_BINS = 10
+
+# ###Statistics of one scored item: index is the item's position on the sheet, level its number of ">", maximum the
+# number in its score suffix. Statistics are None (count and histogram 0) if no student has a number in the column.
+ItemStats = namedtuple("ItemStats", ["index", "label", "level", "maximum", "count", "missing", "mean", "median", "std",
+                                     "min", "max", "mean_percent", "above_maximum", "histogram"])
+
+
+def item_maximum(suffix: str):
+    """
+    :return: maximum score in a GradingItem suffix (e.g. 0.5 for "/.5"), or None if there is none
+    """
+    try:
+        return float(suffix.lstrip("/"))
+    except ValueError:
+        return None
+
+
+def histogram_labels() -> list:
+    """
+    :return: column names of the histogram bins, e.g. "0-10%"
+    """
+    step = 100 // HISTOGRAM_BINS
+    return ["%d-%d%%" % (i * step, (i + 1) * step) for i in range(HISTOGRAM_BINS)]
+
+
+def compute_item_stats(items: list, rows) -> list:
+    """
+    :param items: GradingItems of the sheet, in item order
+    :param rows: iterable of tuples of cell values in item order, one per student
+    :return: list of ItemStats of the scored items, in item order
+    """
+    # numpy and pandas take a while to import, so only import them when statistics are asked for
+    import numpy as np
+    import pandas as pd
+
+    scored = [(i, item, item_maximum(item.suffix)) for i, item in enumerate(items)
+              if item.suffix and not item.is_comment]
+    scored = [(i, item, maximum) for i, item, maximum in scored if maximum is not None]
+    if not scored:
+        return []
+
+    # one conversion of all score cells; anything that is not a number becomes NaN
+    columns = [i for i, _, _ in scored]
+    cells = np.array([[row[i] for i in columns] for row in rows], dtype=object).reshape(-1, len(columns))
+    values = pd.to_numeric(pd.Series(cells.ravel()).str.strip(), errors="coerce").to_numpy(dtype=float)
+    values = values.reshape(cells.shape)
+    maxima = np.array([maximum for _, _, maximum in scored])
+
+    valid = ~np.isnan(values)
+    counts = valid.sum(axis=0)
+    with warnings.catch_warnings():
+        # columns without any number give NaN statistics, reported as None
+        warnings.simplefilter("ignore", RuntimeWarning)
+        means = np.nanmean(values, axis=0)
+        medians = np.nanmedian(values, axis=0)
+        stds = np.nanstd(values, axis=0)
+        lows = np.nanmin(values, axis=0) if len(values) else np.full(len(columns), np.nan)
+        highs = np.nanmax(values, axis=0) if len(values) else np.full(len(columns), np.nan)
+    # items out of 0 (e.g. bonus points) have no histogram
+    ratios = np.divide(values, maxima, out=np.full(values.shape, np.nan), where=maxima > 0)
+
+    # histogram of score / maximum for all items at once, each item's bins offset by its position
+    in_range = valid & (ratios >= 0) & (ratios <= 1)
+    bins = np.minimum((np.nan_to_num(ratios) * HISTOGRAM_BINS).astype(int), HISTOGRAM_BINS - 1)
+    offsets = np.broadcast_to(np.arange(len(columns)) * HISTOGRAM_BINS, values.shape)
+    histograms = np.bincount((offsets + bins)[in_range], minlength=len(columns) * HISTOGRAM_BINS)
+    histograms = histograms.reshape(len(columns), HISTOGRAM_BINS)
+    above = (valid & (ratios > 1)).sum(axis=0)
+
+    def number(value):
+        return None if np.isnan(value) else float(value)
+
+    stats = []
+    for j, (i, item, maximum) in enumerate(scored):
+        label, level, _, _ = ReportTemplate.outline_item(item)
+        mean_percent = number(means[j] / maximum * 100) if maximum else None
+        stats.append(ItemStats(i, label, level, maximum, int(counts[j]), len(values) - int(counts[j]),
+                               number(means[j]), number(medians[j]), number(stds[j]), number(lows[j]),
+                               number(highs[j]), mean_percent, int(above[j]), [int(n) for n in histograms[j]]))
+    return stats
+
+
+def write_stats(stats: list, path: str, assignment_name=None, students=None):
+    """
+    write item statistics to a .json file, or to a .csv file with one row per item and one column per histogram bin
+    """
+    if os.path.splitext(path)[1].lower() == ".json":
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"assignment_name": assignment_name, "students": students, "histogram_bins": histogram_labels(),
+                       "items": [item._asdict() for item in stats]}, f, indent=1, ensure_ascii=False)
+        return
+
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, lineterminator=os.linesep)
+        writer.writerow(list(ItemStats._fields[:-1]) + histogram_labels())
+        for item in stats:
+            writer.writerow(["" if value is None else value for value in item[:-1]] + item.histogram)
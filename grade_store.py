@@ -0,0 +1,325 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""grade_store.py: compact binary copy of a grading sheet, read through memory-mapping
+A grading sheet (.csv or .xlsx) is imported once, after the same cleaning as grades_out.py does, into a .gstore file
+holding the item headers, the parsed grading items and the cells of each item column in one contiguous buffer. Later
+runs (previews, validation, regrade rounds) open the store instead of parsing the sheet, and only decode the rows they
+use. When a newer export of the sheet comes in, only the rows that changed are appended to the store.
+
+File layout: MAGIC, then one or more segments (an array of cell end offsets followed by the UTF-8 cells of the segment's
+rows, column by column), then the metadata as JSON, its length as an 8-byte little-endian integer, and MAGIC again.
+Updates leave the segments and metadata of earlier versions in the file until they take up more than half of it; the
+store is then written anew with only the current rows.
+"""
+
+# Built-in/Generic Imports
+import json
+import mmap
+import os
+import shutil
+import struct
+import sys
+from argparse import ArgumentParser
+from array import array
+from collections.abc import Mapping
+
+# Own modules
+from atomic_write import atomic_write
+from grades_out import GradesOut
+from grading_item import GradingItem, parse_header_row
+from profiling import RunProfile
+
+__author__ = 'Yonglin Wang'
+__version__ = '0.1.0'
+__maintainer__ = 'Yonglin Wang'
+__email__ = 'yonglinw@brandeis.edu'
+
+# ###File suffix and default folder of grade stores
+STORE_SUFFIX = ".gstore"
+STORE_DIR = "conv/stores"
+
+# ###First and last bytes of every store file
+MAGIC = b"GRDSTOR1"
+
+# ###Length of the metadata length at the end of the file, and alignment of offset arrays
+LENGTH_FORMAT = "<Q"
+ALIGNMENT = 8
+
+# ###An update writes the store anew, without the rows and metadata of earlier versions of the sheet, when the updated
+# file would be more than this many times the size of the current rows' data
+COMPACT_RATIO = 2
+
+
+def default_store_path(file_name: str, sheet_name=None) -> str:
+    """
+    :return: path of the store imported from the given grading sheet (and sheet name, for .xlsx) by default
+    """
+    base = os.path.splitext(os.path.basename(file_name))[0]
+    if sheet_name:
+        base += "." + sheet_name
+    return os.path.join(STORE_DIR, base + STORE_SUFFIX)
+
+
+def source_info(file_name: str, sheet_name=None) -> dict:
+    stat = os.stat(file_name)
+    return {"path": os.path.abspath(file_name), "sheet_name": sheet_name, "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size}
+
+
+class SheetReader(GradesOut):
+    """
+    grading sheet loaded and cleaned the same way as by GradesOut, without any LATTE folder or name conversion
+    """
+
+    def __init__(self, file_name: str, sheet_name=None, sheet_cache=True):
+        # no alias, so that assignment_name is None when the sheet does not name the assignment in Cell A1
+        self.assn_alias = None
+        self.profile = RunProfile()
+        self.load_sheet(file_name, sheet_name, sheet_cache, verbose=False)
+
+
+def write_segment(f, rows: list, num_items: int) -> dict:
+    """
+    write the cells of rows at the current position of f, padded so that the offset array is aligned
+    :param rows: list of tuples of cell values, num_items values each
+    :return: {"offsets": position of offset array, "blob": position of cells, "rows": number of rows}
+    """
+    f.write(b"\0" * (-f.tell() % ALIGNMENT))
+    offsets_pos = f.tell()
+
+    # column by column, so that each item column is contiguous
+    cells = [value.encode("utf-8") for column in range(num_items) for value in (row[column] for row in rows)]
+    ends = array("Q", [0])
+    for cell in cells:
+        ends.append(ends[-1] + len(cell))
+
+    f.write(ends.tobytes())
+    blob_pos = f.tell()
+    f.write(b"".join(cells))
+    return {"offsets": offsets_pos, "blob": blob_pos, "rows": len(rows)}
+
+
+def write_trailer(f, meta: dict):
+    data = json.dumps(meta, ensure_ascii=False).encode("utf-8")
+    f.write(data)
+    f.write(struct.pack(LENGTH_FORMAT, len(data)))
+    f.write(MAGIC)
+
+
+def write_store(store_path: str, sheet: SheetReader, source: dict):
+    """
+    write all rows of the loaded sheet into a new store with a single segment, replacing any store at store_path
+    """
+    names = list(sheet.all_info)
+    items, _ = parse_header_row(sheet.item_names)
+
+    os.makedirs(os.path.dirname(store_path) or ".", exist_ok=True)
+    with atomic_write(store_path, "wb") as f:
+        f.write(MAGIC)
+        segment = write_segment(f, list(sheet.all_info.values()), len(sheet.item_names))
+        write_trailer(f, {"version": 1, "byteorder": sys.byteorder, "source": source,
+                          "assignment_name": sheet.assignment_name, "item_names": sheet.item_names,
+                          "items": [[item.prefix, item.suffix, item.is_comment] for item in items],
+                          "segments": [segment], "rows": [[name, 0, i] for i, name in enumerate(names)]})
+
+
+def import_sheet(file_name: str, store_path: str, sheet_name=None, sheet_cache=True) -> int:
+    """
+    import grading sheet into a new store, replacing any store at store_path
+    :return: number of rows imported
+    """
+    sheet = SheetReader(file_name, sheet_name=sheet_name, sheet_cache=sheet_cache)
+    write_store(store_path, sheet, source_info(file_name, sheet_name))
+    return len(sheet.all_info)
+
+
+def data_size(rows) -> int:
+    """
+    :return: bytes taken by the cells and cell offsets of the given rows in a store segment
+    """
+    return sum(len(value.encode("utf-8")) + 8 for entry in rows for value in entry)
+
+
+def update_store(store_path: str, file_name: str, sheet_name=None, sheet_cache=True) -> dict:
+    """
+    bring store up to date with a newer export of its grading sheet by appending only the changed and new rows;
+    rows no longer on the sheet are dropped. The item headers must be the same; otherwise import the sheet again. Once
+    the rows and metadata of earlier versions take up more than half of the file, the store is written anew instead.
+    :return: {"changed": n, "added": n, "removed": n, "unchanged": n, "compacted": whether the store was written anew}
+    """
+    sheet = SheetReader(file_name, sheet_name=sheet_name, sheet_cache=sheet_cache)
+    with GradeStore(store_path) as store:
+        if sheet.item_names != store.item_names:
+            raise ValueError("Item headers of %s differ from those in %s. Please import the sheet again instead."
+                             % (file_name, store_path))
+        meta = store.meta
+        old_rows = dict((name, (segment, index)) for name, segment, index in meta["rows"])
+        patched = [(name, entry) for name, entry in sheet.all_info.items()
+                   if name not in store or store[name] != entry]
+    counts = {"changed": sum(name in old_rows for name, _ in patched),
+              "added": sum(name not in old_rows for name, _ in patched),
+              "removed": len(set(old_rows).difference(sheet.all_info)),
+              "unchanged": len(sheet.all_info) - len(patched), "compacted": False}
+
+    # new rows point to the appended segment, others keep pointing to where they already are
+    new_segment = len(meta["segments"])
+    patched_index = dict((name, i) for i, (name, _) in enumerate(patched))
+    meta["rows"] = [[name, new_segment, patched_index[name]] if name in patched_index else [name] + list(old_rows[name])
+                    for name in sheet.all_info]
+    meta["assignment_name"] = sheet.assignment_name
+    meta["source"] = source_info(file_name, sheet_name)
+
+    trailer_size = len(json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+    updated_size = os.path.getsize(store_path) + data_size(entry for _, entry in patched) + trailer_size
+    if updated_size > COMPACT_RATIO * (data_size(sheet.all_info.values()) + trailer_size):
+        write_store(store_path, sheet, meta["source"])
+        counts["compacted"] = True
+        return counts
+
+    # the updated store is written next to the current one and replaces it once complete, so that an interrupted
+    # update leaves the current store untouched
+    with open(store_path, "rb") as src, atomic_write(store_path, "wb") as f:
+        shutil.copyfileobj(src, f)
+        if patched:
+            meta["segments"].append(write_segment(f, [entry for _, entry in patched], len(store.item_names)))
+        write_trailer(f, meta)
+    return counts
+
+
+class GradeStore(Mapping):
+    """
+    read-only view of a store as {student name on sheet: tuple of values in item order}, in sheet order. Rows are
+    decoded from the memory-mapped file when accessed.
+    """
+
+    def __init__(self, store_path: str):
+        if not os.path.exists(store_path):
+            raise FileNotFoundError("Cannot find grade store %s. Use grade_store.py to import the grading sheet first."
+                                    % store_path)
+        self.path = store_path
+        with open(store_path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.mm)
+
+        tail = len(MAGIC) + struct.calcsize(LENGTH_FORMAT)
+        if len(self.mm) < len(MAGIC) + tail or self.mm[:len(MAGIC)] != MAGIC or self.mm[-len(MAGIC):] != MAGIC:
+            self.close()
+            raise ValueError("%s is not a grade store or is damaged. Please import the grading sheet again." %
+                             store_path)
+        meta_len = struct.unpack(LENGTH_FORMAT, self.mm[-tail:-len(MAGIC)])[0]
+        self.meta = json.loads(str(self.view[-tail - meta_len:-tail], "utf-8"))
+
+        self.assignment_name = self.meta["assignment_name"]
+        self.item_names = self.meta["item_names"]
+        self.num_items = len(self.item_names)
+
+        # offset arrays are used in place, unless the store was written on a machine of the other byte order
+        self.segments = []
+        for segment in self.meta["segments"]:
+            count = self.num_items * segment["rows"] + 1
+            offsets = self.view[segment["offsets"]:segment["offsets"] + 8 * count]
+            if self.meta["byteorder"] == sys.byteorder:
+                offsets = offsets.cast("Q")
+            else:
+                swapped = array("Q")
+                swapped.frombytes(offsets)
+                swapped.byteswap()
+                offsets = swapped
+            self.segments.append((offsets, segment["blob"], segment["rows"]))
+
+        self.index = dict((name, (segment, index)) for name, segment, index in self.meta["rows"])
+
+    def __getitem__(self, name: str) -> tuple:
+        segment, index = self.index[name]
+        offsets, blob, rows = self.segments[segment]
+        view = self.view
+        return tuple(str(view[blob + offsets[cell]:blob + offsets[cell + 1]], "utf-8")
+                     for cell in range(index, self.num_items * rows, rows))
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, name) -> bool:
+        return name in self.index
+
+    def grading_items(self) -> list:
+        """
+        :return: GradingItems as parsed at import, in item order
+        """
+        return [GradingItem.from_parts(prefix, suffix, is_comment) for prefix, suffix, is_comment in self.meta["items"]]
+
+    def is_outdated(self) -> bool:
+        """
+        :return: whether the grading sheet the store was imported from changed since
+        """
+        source = self.meta["source"]
+        try:
+            stat = os.stat(source["path"])
+        except OSError:
+            return False
+        return (stat.st_mtime_ns, stat.st_size) != (source["mtime_ns"], source["size"])
+
+    def close(self):
+        # offset arrays and the file view must be released before the map can be closed
+        for offsets, _, _ in getattr(self, "segments", []):
+            if isinstance(offsets, memoryview):
+                offsets.release()
+        self.segments = []
+        self.view.release()
+        self.mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main():
+    parser = ArgumentParser(prog="grade_store.py",
+                            description="Import a grading sheet into a compact store read by \"grades_out.py "
+                                        "--from_store\", or update a store with a newer export of the sheet.")
+    parser.add_argument("command", choices=["import", "update", "info"],
+                        help="import: create the store from the sheet, replacing any previous store; update: append "
+                             "only the rows that changed in the sheet; info: describe the store.")
+    parser.add_argument("grading_sheet_file", help="grading sheet file (.csv or .xlsx) for import and update; for "
+                                                   "info, the sheet the store was imported from or the store itself.")
+    parser.add_argument("--sheet_name", type=str, default=None, help="required for .xlsx files only.")
+    parser.add_argument("--store", type=str, default=None,
+                        help="path of the store (default: %s/<sheet file name>[.<sheet name>]%s). Use it to update "
+                             "a store from a newer export saved under a different name." % (STORE_DIR, STORE_SUFFIX))
+    parser.add_argument("--no_sheet_cache", action="store_true",
+                        help="for .xlsx files, always parse the sheet instead of reusing the sheet parsed in a "
+                             "previous run.")
+    args = parser.parse_args()
+
+    if args.store:
+        store_path = args.store
+    elif args.grading_sheet_file.endswith(STORE_SUFFIX):
+        store_path = args.grading_sheet_file
+    else:
+        store_path = default_store_path(args.grading_sheet_file, args.sheet_name)
+
+    if args.command == "import":
+        count = import_sheet(args.grading_sheet_file, store_path, sheet_name=args.sheet_name,
+                             sheet_cache=not args.no_sheet_cache)
+        print("Imported %d rows from %s into %s" % (count, args.grading_sheet_file, store_path))
+    elif args.command == "update":
+        counts = update_store(store_path, args.grading_sheet_file, sheet_name=args.sheet_name,
+                              sheet_cache=not args.no_sheet_cache)
+        print("Updated %s from %s: %d changed, %d added, %d removed, %d unchanged%s" % (
+            store_path, args.grading_sheet_file, counts["changed"], counts["added"], counts["removed"],
+            counts["unchanged"], " (store compacted)" if counts["compacted"] else ""))
+    else:
+        with GradeStore(store_path) as store:
+            print("Store %s: %d rows x %d items, %d segments, %d bytes, imported from %s%s" % (
+                store_path, len(store), store.num_items, len(store.segments), len(store.mm),
+                store.meta["source"]["path"], " (changed since)" if store.is_outdated() else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -6,19 +6,34 @@ Requires: 1) a structured folder of student submissions (obtained from LATTE) an
 
 Currently, cannot deal with:
 1. saving reports to students who didn't submit through LATTE (e.g. via email, so no LATTE folder) but have grades; an error will occur in this case, fix in progress.
+
+Modules that take a while to import (pandas, numpy, multiprocessing, zipfile, asyncio, cProfile) are only imported in
+the functions that need them, to keep start-up fast.
 """
 
 # Built-in/Generic Imports
+import csv
+import heapq
 import os
 import random
 import sys
 from collections import OrderedDict, Counter
 from argparse import ArgumentParser
-import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 
 # Own modules
 import name_convert
-from grading_item import GradingItem
+from csv_sheet import CsvSheet
+from dir_snapshot import DirectorySnapshot
+from folder_index import FolderIndex
+from grading_item import HeaderStats, parse_header_row
+from profiling import RunProfile
+from report_formats import DEFAULT_FORMAT, RENDERERS
+from report_manifest import ReportManifest, hash_fields
+from report_template import ContextLine, ReportTemplate
+from sheet_cache import load_cached_sheet, save_cached_sheet
+from staged_commit import StagedCommit
 
 __author__ = 'Yonglin Wang'
 __version__ = '0.1.0'
@@ -37,22 +52,31 @@ NAME_VALUES_TO_DROP = {"#REF!", ""}
 # ###Name of column containing student name in grading sheet
 NAME_COL = "Name"
 
+# ###Number of sheet rows sent to each worker process when rendering reports in parallel
+RENDER_CHUNK_SIZE = 200
+
+# ###Number of sheet rows read, rendered and saved at a time when streaming a grading sheet
+STREAM_CHUNK_SIZE = 500
+
 # ###LATTE-Grading name conversion csv path and pivot column name in the conversion csv file
 NAME_CONV_PATH = name_convert.OUTPUT_PATH  # "./conv/latte_grading_conversion.csv"
 GRADING_NAME = name_convert.GRADING_COL_NAME  # "Name on Grading Sheet"
 
 
-def get_df_from_path(f_path, sheet_n=None):
+def get_df_from_path(f_path, sheet_n=None, use_cache=True):
     """
     get DataFrame from given file path and, if file is .xlsx, sheet name
     :param f_path:
     :param sheet_n:
+    :param use_cache: for .xlsx, reuse the sheet parsed in a previous run if the file has not changed since
     :return:
     """
     # check if file exists
     if not os.path.exists(f_path):
         raise FileNotFoundError("Cannot find grading sheet file %s" % f_path)
 
+    import pandas as pd
+
     # if file is .csv
     if f_path.lower().endswith(".csv"):
         return pd.read_csv(f_path, dtype='str', header=None)
@@ -63,25 +87,129 @@ def get_df_from_path(f_path, sheet_n=None):
         if not sheet_n:
             raise ValueError("Missing sheet name for the .xlsx file entered.")
 
-        # ensure sheet found in file
-        all_sheet_names = pd.read_excel(f_path, None, dtype='str').keys()
-        if sheet_n not in all_sheet_names:
-            raise ValueError("Cannot find sheet named \'%s\' in file %s. Please check spelling and case." % (
-                sheet_n, f_path))
+        # skip parsing altogether if the same sheet of the same file was parsed before
+        if use_cache:
+            df = load_cached_sheet(f_path, sheet_n)
+            if df is not None:
+                return df
 
-        return pd.read_excel(f_path, sheet_name=sheet_n, header=None)
+        # ensure sheet found in file; sheet names come from workbook metadata, without parsing any sheet
+        with pd.ExcelFile(f_path) as workbook:
+            if sheet_n not in workbook.sheet_names:
+                raise ValueError("Cannot find sheet named \'%s\' in file %s. Please check spelling and case." % (
+                    sheet_n, f_path))
+
+            # parse requested sheet only
+            df = workbook.parse(sheet_name=sheet_n, header=None)
+
+        if use_cache:
+            save_cached_sheet(f_path, sheet_n, df)
+        return df
 
     # otherwise, cannot process given file
     else:
         raise ValueError("Cannot recognize file suffix of %s" % f_path)
 
 
+def render_report_chunk(template: ReportTemplate, rows: list) -> list:
+    """
+    render a chunk of (name, values) rows, for use in worker processes
+    :return: list of string reports in the same order as rows
+    """
+    return template.render_all(rows)
+
+
+def write_report(path: str, report: str, encoding=None):
+    """
+    save a single report to path, same as the sequential distribution does
+    :param encoding: encoding of the file; the locale's, as for .txt reports, if not given
+    """
+    with open(path, "w", encoding=encoding) as f:
+        f.write(report)
+
+
+def load_conversion_dict() -> dict:
+    """
+    load name conversion .csv file as {grading name: LATTE name}
+    """
+    try:
+        with open(NAME_CONV_PATH, newline="", encoding="utf-8-sig") as f:
+            reader = csv.DictReader(f)
+            # LATTE name is the first column other than the grading name
+            latte_col = [col for col in reader.fieldnames if col != GRADING_NAME][0]
+            return dict((row[GRADING_NAME], row[latte_col]) for row in reader)
+    except FileNotFoundError:
+        raise FileNotFoundError("Cannot find name conversion .csv file at %s. Please refer to README and/or "
+                                "use name_convert.py to generate one." % NAME_CONV_PATH)
+
+
+def check_duplicate_columns(columns: list, file_name: str):
+    """
+    ensure there's no duplicate column names on grading sheet
+    """
+    duplicates = [item for item, count in Counter(columns).items() if count > 1]
+    if duplicates:
+        raise RuntimeError("Column \"%s\" is duplicated. "
+                           "Please modify %s so that it does not contain any duplicated column names."
+                           % (duplicates[0], file_name))
+
+
+def rows_to_dict(rows) -> OrderedDict:
+    """
+    :param rows: iterable of (student name on sheet, entry)
+    :return: ordered dictionary {student name: entry}, ensuring each student has one and only one row
+    """
+    all_info = OrderedDict()
+    for name, entry in rows:
+        if name in all_info:
+            raise ValueError("Student name \"%s\" appears in more than one row of the grading sheet. "
+                             "Please remove or rename the duplicated rows." % name)
+        all_info[name] = entry
+    return all_info
+
+
+def column_to_str(column):
+    """
+    convert a DataFrame column to strings, with empty string for missing values
+    :param column: pandas Series
+    :return: pandas Series of str
+    """
+    column = column.fillna("")
+    # non-text columns (e.g. numbers from .xlsx) go through str() so that values read the same as on the sheet
+    if column.dtype == object:
+        return column.astype(str)
+    return column.map(str)
+
+
 class GradesOut:
+    # report formats saved, see report_formats.RENDERERS
+    formats = (DEFAULT_FORMAT,)
 
     def __init__(self, student_folder_path: str, file_name: str, assn_alias="submission", sheet_name=None,
-                 verbose=True, disable_not_found=False):
+                 verbose=True, disable_not_found=False, sheet_cache=True, conv_dict=None, folder_index=None,
+                 snapshot=None, profile=None, match_folders=True, formats=None):
+        """
+        :param conv_dict: name conversion dictionary {grading name: LATTE name} already loaded, e.g. by another
+        GradesOut; loaded from NAME_CONV_PATH if not given
+        :param folder_index: FolderIndex of student_folder_path already built; built here if not given
+        :param snapshot: DirectorySnapshot of student_folder_path; if given, student folders and existing reports are
+        looked up in the snapshot instead of on disk
+        :param profile: RunProfile recording the time spent in each phase; a new one is used if not given
+        :param match_folders: match all students to their folders now; otherwise each student is matched when first
+        needed (e.g. to preview a few reports quickly), and match_folders can be called later
+        :param formats: names of the report formats to save (see report_formats.RENDERERS), all rendered from the same
+        model of each report; only the plain text report (DEFAULT_FORMAT) if not given
+        """
         # record assignment shorthand
         self.assn_alias = assn_alias
+        self.disable_not_found = disable_not_found
+        self.profile = profile if profile is not None else RunProfile()
+        if formats:
+            unknown = [name for name in formats if name not in RENDERERS]
+            if unknown:
+                raise ValueError("Unknown report format(s) %s. Available formats: %s" %
+                                 (", ".join(unknown), ", ".join(RENDERERS)))
+            self.formats = tuple(formats)
 
         # record path to latte folder
         if os.path.isdir(student_folder_path):
@@ -91,11 +219,116 @@ class GradesOut:
 
         if verbose:
             print("Loading grading sheet from %s..." % file_name, end="")
-        # get headerless DataFrame from path
-        self.df = get_df_from_path(file_name, sheet_n=sheet_name)
+        self.load_sheet(file_name, sheet_name, sheet_cache, verbose)
+        self.profile.count("rows", len(self.all_info))
         if verbose:
             print(" Done!")
 
+        # index all immediate subdirectories under the given path by LATTE name, this time with full relative path
+        self.snapshot = snapshot
+        with self.profile.phase("index folders"):
+            if folder_index is not None:
+                self.folder_index = folder_index
+            elif snapshot is not None:
+                self.folder_index = FolderIndex(snapshot.folder_paths())
+            else:
+                self.folder_index = FolderIndex.from_directory(self.latte_path)
+
+        # load name conversion dictionary
+        with self.profile.phase("load names"):
+            self.conv_dict = conv_dict if conv_dict is not None else load_conversion_dict()
+
+        # ensure all names have one and only one corresponding directory
+        self.save_dir = {}
+        if match_folders:
+            self.match_folders()
+
+        with self.profile.phase("compile template"):
+            # generate grade items, as parsed at import for grade stores, otherwise reusing those of headers seen before
+            if self.store is not None:
+                self.items, item_stats = self.store.grading_items(), HeaderStats(0, 0)
+            else:
+                self.items, item_stats = parse_header_row(self.item_names)
+
+            # compile report layout once for all students
+            self.template = ReportTemplate(self.items, REPORT_TITLE, self.assignment_name)
+            self.renderers = [RENDERERS[name](self.template) for name in self.formats]
+        self.profile.count("items", len(self.items))
+        self.profile.count("item cache hits", item_stats.hits)
+
+    def add_profile_hook(self, callback):
+        """
+        call callback(kind, name, value) after each phase or counter is recorded; see RunProfile.add_hook. Hooks added
+        after construction only see the distribution phases; pass a RunProfile with hooks to see all of them.
+        """
+        self.profile.add_hook(callback)
+
+    def load_sheet(self, file_name: str, sheet_name: str, sheet_cache: bool, verbose: bool):
+        """
+        load grading sheet, setting self.assignment_name, self.item_names and self.all_info
+        """
+        self.store = None
+        # .csv sheets are read and cleaned row by row, without pandas; .xlsx sheets go through a DataFrame
+        if file_name.lower().endswith(".csv"):
+            with self.profile.phase("load sheet"):
+                self.load_csv_sheet(file_name)
+        elif file_name.lower().endswith(".gstore"):
+            with self.profile.phase("load sheet"):
+                self.load_store_sheet(file_name, verbose)
+        else:
+            self.load_dataframe_sheet(file_name, sheet_name, sheet_cache, verbose)
+
+    def load_store_sheet(self, file_name: str, verbose: bool):
+        """
+        open grade store created by grade_store.py, setting self.store and, with rows read from the store when
+        needed, self.assignment_name, self.item_names and self.all_info
+        :param file_name: path to .gstore file
+        """
+        # grade_store imports this module, so it is imported here rather than at the top
+        from grade_store import GradeStore
+
+        self.df = None
+        self.store = GradeStore(file_name)
+        if verbose and self.store.is_outdated():
+            print("\nNote: %s changed since it was imported into %s. Run \"python grade_store.py update %s\" to "
+                  "bring the store up to date." % (self.store.meta["source"]["path"], file_name,
+                                                   self.store.meta["source"]["path"]), end="")
+
+        # sheets without an assignment name in Cell A1 use the alias, as for .csv and .xlsx sheets
+        self.assignment_name = self.store.assignment_name or self.assn_alias
+        self.item_names = list(self.store.item_names)
+        self.all_info = self.store
+
+    def load_csv_sheet(self, file_name: str):
+        """
+        read .csv grading sheet with the standard library, setting self.assignment_name, self.item_names and
+        self.all_info the same way as load_dataframe_sheet would
+        :param file_name: path to .csv grading sheet
+        """
+        if not os.path.exists(file_name):
+            raise FileNotFoundError("Cannot find grading sheet file %s" % file_name)
+        self.df = None
+
+        # detect header in A1 or A2, and which columns to keep
+        sheet = CsvSheet(file_name, NAME_COL, NAME_VALUES_TO_DROP, self.assn_alias)
+        self.assignment_name = sheet.assignment_name
+
+        # ensure there's no duplicate Columns
+        check_duplicate_columns(sheet.header, file_name)
+
+        # convert sheet into {student: (info)}
+        self.all_info = rows_to_dict(sheet)
+        self.item_names = sheet.header[1:]
+
+    def load_dataframe_sheet(self, file_name: str, sheet_name: str, sheet_cache: bool, verbose: bool):
+        """
+        load grading sheet into self.df with pandas and normalize it, setting self.assignment_name,
+        self.item_names and self.all_info
+        """
+        # get headerless DataFrame from path
+        with self.profile.phase("load sheet"):
+            self.df = get_df_from_path(file_name, sheet_n=sheet_name, use_cache=sheet_cache)
+
         # check if Name column is in A1 or A2
         # if name column and header in first row
         if self.df.at[0, 0].strip() == NAME_COL:
@@ -103,7 +336,7 @@ class GradesOut:
             self.df.at[0, 0] = NAME_COL
 
             # if Name in Cell A1, assignment name is not specified and will be same as alias name
-            self.assignment_name=assn_alias
+            self.assignment_name = self.assn_alias
 
         # if name column and header in second row
         elif self.df.loc[1, 0].strip() == NAME_COL:
@@ -121,43 +354,19 @@ class GradesOut:
                            "Please make sure either Cell A1 or A2 is name as \"%s\"." % (NAME_COL, NAME_COL))
 
         if verbose:
-            print("Processing grading sheet...", end="")
+            print(" Done!\nProcessing grading sheet...", end="")
         # dropping empty rows, columns, and rows with #REF! in Name, normalize DataFrame to all String
-        self.normalize_dataframe()
-        if verbose:
-            print(" Done!")
+        with self.profile.phase("normalize"):
+            self.normalize_dataframe()
 
-        # ensure there's no duplicate Columns
-        duplicates = [item for item, count in Counter(self.df.columns.to_list()).items() if count > 1]
-        if duplicates:
-            raise RuntimeError("Column \"%s\" is duplicated. "
-                               "Please modify %s so that it does not contain any duplicated column names."
-                               % (duplicates[0], file_name))
-
-        # convert sheet into {student: [info]}
-        self.all_info = self.df.set_index(NAME_COL).to_dict(orient="index", into=OrderedDict)
-
-        # get all immediate subdirectories under the given path, this time with full relative path
-        all_subs = set([f.path for f in os.scandir(self.latte_path) if f.is_dir()])
-
-        # load name conversion dictionary
-        try:
-            conv_dict = pd.read_csv(NAME_CONV_PATH, index_col=GRADING_NAME).to_dict(orient="index", into=OrderedDict)
-        except FileNotFoundError:
-            raise FileNotFoundError("Cannot find name conversion .csv file at %s. Please refer to README and/or "
-                                    "use name_convert.py to generate one." % NAME_CONV_PATH)
-        # flatten the 2D dictionary
-        self.conv_dict = dict([(name, list(conv_dict[name].values())[0]) for name in conv_dict.keys()])
+            # ensure there's no duplicate Columns
+            check_duplicate_columns(self.df.columns.to_list(), file_name)
 
-        # ensure all names have one and only one corresponding directory
-        self.save_dir = dict(
-            [(name, self.match_name_to_folder(name.strip(), all_subs, disable_not_found=disable_not_found))
-             for name in self.all_info.keys()])
+            # convert sheet into {student: (info)}
+            self.all_info = self.build_row_view()
 
-        # generate grade items
-        item_list = self.df.columns.to_list()
-        item_list.remove(NAME_COL)
-        self.items = [GradingItem(item_name) for item_name in item_list]
+        self.item_names = self.df.columns.to_list()
+        self.item_names.remove(NAME_COL)
 
     def normalize_dataframe(self):
         """
@@ -165,48 +374,95 @@ class GradesOut:
         and dropping rows with non-name string under name column
         :return:
         """
-        # drop empty rows and columns
-        self.df.dropna(how="all", inplace=True)
-        self.df.dropna(axis=1, how="all", inplace=True)
-
-        # change all na and NaN to an empty string
-        self.df.fillna("", inplace=True)
+        # drop empty rows and columns in a single selection; a column's emptiness does not depend on empty rows
+        not_empty = self.df.notna()
+        df = self.df.loc[not_empty.any(axis=1), not_empty.any(axis=0)]
 
-        # change all to string
-        self.df = self.df.applymap(str)
+        # change all na and NaN to an empty string and all to string, one whole column at a time
+        import pandas as pd
+        df = pd.DataFrame(dict((i, column_to_str(df.iloc[:, i])) for i in range(df.shape[1])), index=df.index)
 
-        # set new first row as column name
-        self.df.columns = self.df.iloc[0]   # set columns--this does not remove the first row
-        self.df = self.df[1:]               # we remove the first row again
-        self.df.columns.name = ""           # remove the redundant index
+        # set new first row as column name and remove it from the rows
+        df.columns = df.iloc[0].to_list()
+        df = df.iloc[1:]
+        df.columns.name = ""           # remove the redundant index
 
         # drop rows without actual names (e.g. those containing #REF! or "")
-        self.df = self.df[~self.df[NAME_COL].isin(NAME_VALUES_TO_DROP)]
+        self.df = df[~df[NAME_COL].isin(NAME_VALUES_TO_DROP)]
 
-    def validate_files(self, warning_only=False):
+    def build_row_view(self) -> OrderedDict:
+        """
+        get {student name on sheet: tuple of the student's values in item order} from the normalized self.df,
+        built from whole columns rather than row by row
+        :return: ordered dictionary of student rows
+        """
+        name_loc = self.df.columns.get_loc(NAME_COL)
+        names = self.df.iloc[:, name_loc].to_list()
+        value_columns = [self.df.iloc[:, i].to_list() for i in range(self.df.shape[1]) if i != name_loc]
+
+        return rows_to_dict(zip(names, zip(*value_columns) if value_columns else [()] * len(names)))
+
+    def validate_files(self, warning_only=False, names=None):
         """
         Run this method to make sure no report exists before generation
+        :param names: only check reports of these grading names, e.g. the changed ones in incremental distribution
         :return:
         """
         # total number of files to be overwritten
         counter = 0
 
-        for grading_name, save_dir in self.save_dir.items():
-            # check if file exists under path
-            if os.path.exists(os.path.join(save_dir, self.generate_file_name(grading_name))):
-                if warning_only:
-                    print("File %s already exists in %s. It will be overwritten by the program."
-                          % (self.generate_file_name(grading_name), save_dir))
-                    counter+=1
-                else:
-                    raise FileExistsError("File %s already exists in %s. Consider deleting or renaming."
-                                          % (self.generate_file_name(grading_name), save_dir))
+        for grading_name in self.all_info:
+            if names is not None and grading_name not in names:
+                continue
+            save_dir = self.folder_of(grading_name)
+            # check if file exists under path, in every format saved
+            for file_name in self.file_names(grading_name):
+                if self.report_exists(save_dir, file_name):
+                    if warning_only:
+                        print("File %s already exists in %s. It will be overwritten by the program."
+                              % (file_name, save_dir))
+                        counter+=1
+                    else:
+                        raise FileExistsError("File %s already exists in %s. Consider deleting or renaming."
+                                              % (file_name, save_dir))
 
         # in the end, report total # of files to overwrite, if allowed and overwritten exists
         if counter != 0:
             print("Total number of files to be overwritten: %d" % counter)
 
-    def match_name_to_folder(self, grading_name: str, all_subs: set, disable_not_found=False) -> str:
+    def keep_rows(self, predicate) -> list:
+        """
+        keep only the students for whom predicate(grading name) is true, e.g. those of one shard of the sheet. Call it
+        before any folder matching or distribution.
+        :return: grading names of the students dropped
+        """
+        dropped = [grading_name for grading_name in self.all_info if not predicate(grading_name)]
+        if dropped:
+            dropped_names = set(dropped)
+            self.all_info = OrderedDict((grading_name, entry) for grading_name, entry in self.all_info.items()
+                                        if grading_name not in dropped_names)
+        return dropped
+
+    def match_folders(self):
+        """
+        match every student on the sheet to their LATTE folder, raising errors for missing names or folders now
+        rather than during distribution
+        """
+        with self.profile.phase("match folders"):
+            for grading_name in self.all_info:
+                self.folder_of(grading_name)
+
+    def folder_of(self, grading_name: str) -> str:
+        """
+        :return: LATTE folder of the given student, matched the first time it is needed
+        """
+        save_dir = self.save_dir.get(grading_name)
+        if save_dir is None:
+            save_dir = self.match_name_to_folder(grading_name.strip(), disable_not_found=self.disable_not_found)
+            self.save_dir[grading_name] = save_dir
+        return save_dir
+
+    def match_name_to_folder(self, grading_name: str, disable_not_found=False) -> str:
         """
         return corresponding student LATTE folder path based on a given student name on sheet. Ignores [MS]
         :return: string path of student's LATTE folder under the given folder
@@ -215,17 +471,19 @@ class GradesOut:
             latte_name = self.conv_dict[grading_name]
         except KeyError:
             raise KeyError(
-                "Cannot find name %s in %s. Check spelling or add a new name conversion entry."
+                "Cannot find name %s in %s. Check spelling or add a new name conversion entry (python name_match.py "
+                "suggests the most similar LATTE folders)."
                 % (grading_name, NAME_CONV_PATH))
 
-        match = [d for d in all_subs if latte_name in d]
+        match = self.folder_index.lookup(latte_name)
 
         # error out if folder not found
         if not match:
             # raise error if no missing folder is allowed
             if disable_not_found:
                 raise ValueError("Cannot find LATTE folder containing name %s. Check LATTE folder name spelling on "
-                                 "conversion file or if LATTE folder exists." % latte_name)
+                                 "conversion file or if LATTE folder exists (python name_match.py suggests the most similar "
+                                 "LATTE folders)." % latte_name)
             # if allow not found student folder, save the file at LATTE parent folder
             else:
                 print("Cannot find LATTE folder containing name %s. The corresponding report will be saved at %s." %
@@ -241,47 +499,624 @@ class GradesOut:
 
     def generate_report(self, name: str, entry: dict) -> str:
         """
-        generate string report based on given feedback info object of the student. Note: entry dictionary should be ordered
+        generate string report based on given feedback info object of the student. Note: entry should be ordered
         because we assume an ordered correspondence between entry items and self.items
         :param name: name of student to generate report for, as seen on grading sheet
-        :param entry: dictionary containing info for report output
+        :param entry: tuple (as in self.all_info) or ordered dictionary containing info for report output
         :return: string formatted assignment report
         """
-        output = "%s %s\n\nStudent Name: %s\n\n" % (REPORT_TITLE.strip(),
-                                                   self.assignment_name.replace("\n", "\n\t"),
-                                                   name)
+        return self.template.render(name, entry.values() if isinstance(entry, dict) else entry)
+
+    def render_formats(self, name: str, entry) -> list:
+        """
+        generate the reports of one student in every format of self.formats, from a single model of the report
+        :param name: name of student to generate report for, as seen on grading sheet
+        :param entry: tuple (as in self.all_info) or ordered dictionary containing info for report output
+        :return: list of string reports, in the order of self.formats
+        """
+        if self.formats == (DEFAULT_FORMAT,):
+            return [self.generate_report(name, entry)]
+        model = self.template.model(name, entry.values() if isinstance(entry, dict) else entry)
+        return [renderer.render(model) for renderer in self.renderers]
+
+    def plan_incremental(self):
+        """
+        compare each student's sheet row and report against the manifest of previous distributions of this
+        assignment alias, and record the reports that need to be saved in self.changed_reports as
+        {grading name: report}. Students whose report would be the same as the one on disk are counted in
+        self.unchanged_count.
+        :return: number of changed reports
+        """
+        with self.profile.phase("plan incremental"):
+            self.manifest = ReportManifest(self.assn_alias)
+            self.changed_reports = OrderedDict()
+            self.unchanged_count = 0
+            self.row_hashes = {}
+
+            # anything outside the rows that shows up in reports
+            header_hash = hash_fields([REPORT_TITLE, self.assignment_name] + self.item_names +
+                                      ([self.template.tail] if self.template.tail else []))
+
+            for grading_name, feedback in self.all_info.items():
+                report_path = self.report_path(grading_name)
+                row_hash = hash_fields((grading_name,) + feedback)
+                self.row_hashes[grading_name] = row_hash
+
+                # same input as last time and file untouched since: no need to generate the report
+                if self.manifest.is_current(grading_name, report_path, row_hash, header_hash):
+                    self.unchanged_count += 1
+                    continue
+
+                report = self.generate_report(grading_name.replace(",", ", "), feedback)
+                content_hash = hash_fields([report])
+
+                # input changed, but not in a way that shows in the report
+                if self.manifest.is_on_disk(grading_name, report_path, content_hash):
+                    self.manifest.record(grading_name, report_path, row_hash, header_hash, content_hash)
+                    self.unchanged_count += 1
+                else:
+                    self.changed_reports[grading_name] = report
+
+            self.header_hash = header_hash
+        self.profile.count("reports unchanged", self.unchanged_count)
+        return len(self.changed_reports)
+
+    def distribute_grade_incremental(self):
+        """
+        distributes only the reports found changed by plan_incremental (which is run first if needed), and updates
+        the manifest of this assignment alias
+        :return: number of reports saved
+        """
+        if not hasattr(self, "changed_reports"):
+            self.plan_incremental()
 
-        for info, item in zip(entry.values(), self.items):
-            output += item.insert_info(info)
+        counter = 0
+        try:
+            for grading_name, report in self.changed_reports.items():
+                report_path = self.report_path(grading_name)
+                self.save_report(report_path, report)
+                self.manifest.record(grading_name, report_path, self.row_hashes[grading_name], self.header_hash,
+                                     hash_fields([report]))
+                counter += 1
+        finally:
+            # keep the record of whatever has been saved, even if distribution stops partway
+            self.manifest.save()
 
-        return output
+        return counter
 
-    def distribute_grade(self):
+    def distribute_grade(self, workers=1, render_processes=False, staged=False, incremental=False,
+                         async_concurrency=0, archive=None):
         """
         distributes grades to student LATTE folders
-        :return:
+        :param workers: number of threads writing reports; more than 1 enables parallel distribution, in which case
+        failed reports are recorded in self.failed_reports instead of stopping the distribution
+        :param render_processes: in parallel distribution, also generate reports in a pool of worker processes
+        :param staged: stage all reports first and then move them into place; see distribute_grade_staged
+        :param incremental: only save reports that changed since the last distribution; see plan_incremental
+        :param async_concurrency: if above 0, save reports with the asyncio engine with at most this many writes in
+        flight; see distribute_grade_async
+        :param archive: path of a .zip archive to save all reports into instead of student folders; see
+        distribute_grade_archive
+        :return: number of reports saved
         """
+        if archive:
+            return self.distribute_grade_archive(archive)
+        # folders nobody changed since the snapshot was refreshed; only they can be recorded as up to date afterward
+        if self.snapshot is not None:
+            self.snapshot_current = self.snapshot.current_folders(set(self.folder_of(grading_name)
+                                                                      for grading_name in self.all_info))
+        if self.formats != (DEFAULT_FORMAT,) and (incremental or staged or async_concurrency > 0 or workers > 1):
+            raise ValueError("Reports in formats other than %s can only be saved one student at a time or into an "
+                             "archive." % DEFAULT_FORMAT)
+        if incremental:
+            return self.distribute_grade_incremental()
+        if staged:
+            return self.distribute_grade_staged()
+        if async_concurrency > 0:
+            return self.distribute_grade_async(async_concurrency)
+        if workers > 1:
+            return self.distribute_grade_parallel(workers, render_processes=render_processes)
 
         # record total number of reports generated
         counter = 0
+        encodings = [renderer.encoding for renderer in self.renderers]
 
         # process each grading entry
         for grading_name, feedback in self.all_info.items():
-            # generate file name
-            file_name = self.generate_file_name(grading_name)
-
-            # save generated report to given directory
-            with open(os.path.join(self.save_dir[grading_name], file_name), "w") as f:
-                # generate and save
-                f.write(self.generate_report(grading_name.replace(",", ", "), feedback))
-                # add total reports number
+            # generate report, in every format
+            with self.profile.phase("render"):
+                reports = self.render_formats(grading_name.replace(",", ", "), feedback)
+
+            # save generated reports to given directory
+            self.save_reports(self.report_paths(grading_name), reports, encodings)
+            # add total reports number
+            counter += 1
+
+        return counter
+
+    def distribute_grade_parallel(self, workers: int, render_processes=False):
+        """
+        distributes grades to student LATTE folders with a pool of writer threads. Failures for individual students
+        are collected into self.failed_reports as {grading name: error message}.
+        :param workers: number of writer threads (and of render processes, if enabled)
+        :param render_processes: generate reports in a pool of worker processes before writing
+        :return: number of reports saved
+        """
+        self.failed_reports = OrderedDict()
+        rows = list(self.all_info.items())
+        display_names = [grading_name.replace(",", ", ") for grading_name, _ in rows]
+
+        # generate reports, either in this process or in chunks across worker processes
+        with self.profile.phase("render"):
+            if render_processes:
+                from concurrent.futures import ProcessPoolExecutor
+                chunks = [[(display_names[i], entry)
+                           for i, (_, entry) in enumerate(rows[start:start + RENDER_CHUNK_SIZE], start)]
+                          for start in range(0, len(rows), RENDER_CHUNK_SIZE)]
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    reports = [report for chunk in pool.map(render_report_chunk, [self.template] * len(chunks), chunks)
+                               for report in chunk]
+            else:
+                reports = self.template.render_all((display_name, entry)
+                                                   for display_name, (_, entry) in zip(display_names, rows))
+
+        # save generated reports to their directories, recording failures by student
+        counter = 0
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [(grading_name, pool.submit(self.save_report, self.report_path(grading_name), report))
+                       for (grading_name, _), report in zip(rows, reports)]
+
+            for grading_name, future in futures:
+                exc = future.exception()
+                if exc is None:
+                    counter += 1
+                else:
+                    self.failed_reports[grading_name] = "%s: %s" % (type(exc).__name__, str(exc))
+
+        return counter
+
+    def distribute_grade_archive(self, archive_path: str):
+        """
+        saves all reports into a single .zip archive instead of student folders, under the same paths relative to the
+        LATTE parent folder (<student folder>/<report file name>), ready for LATTE's "Upload multiple feedback files in
+        a zip". The archive is written in one pass; nothing is saved to student folders.
+        :param archive_path: path of .zip archive to create, overwritten if it exists
+        :return: number of reports saved
+        """
+        from io import TextIOWrapper
+        from zipfile import ZipFile, ZIP_DEFLATED
+
+        counter = 0
+        with ZipFile(archive_path, "w", compression=ZIP_DEFLATED) as archive:
+            for grading_name, feedback in self.all_info.items():
+                with self.profile.phase("render"):
+                    reports = self.render_formats(grading_name.replace(",", ", "), feedback)
+
+                with self.profile.phase("write"):
+                    for path, report, renderer in zip(self.report_paths(grading_name), reports, self.renderers):
+                        arcname = os.path.relpath(path, self.latte_path).replace(os.sep, "/")
+                        # same encoding and line endings as a report saved by write_report
+                        with TextIOWrapper(archive.open(arcname, "w"), encoding=renderer.encoding) as f:
+                            f.write(report)
+                self.profile.count("reports saved")
+                if self.profile.detailed:
+                    self.profile.count("bytes written", sum(len(report.encode("utf-8")) for report in reports))
                 counter += 1
 
         return counter
 
+    def distribute_grade_async(self, concurrency: int, on_result=None):
+        """
+        distributes grades to student LATTE folders with the asyncio engine of async_distribute.py, retrying writes
+        that fail with transient errors. Reports that still fail are recorded in self.failed_reports as
+        {grading name: error message}.
+        :param concurrency: maximum number of writes in flight
+        :param on_result: called with each async_distribute.WriteResult as soon as it is known, e.g. to show progress
+        :return: number of reports saved
+        """
+        import asyncio
+        from async_distribute import AsyncDistributor
+
+        results = asyncio.run(AsyncDistributor(self, concurrency=concurrency).run(on_result=on_result))
+        self.failed_reports = OrderedDict((result.grading_name, result.error) for result in results if result.error)
+        return len(results) - len(self.failed_reports)
+
+    def distribute_grade_staged(self):
+        """
+        distributes grades to student LATTE folders through a journaled staging folder under the LATTE parent folder:
+        all reports are generated and saved to the staging folder before any student folder is touched. If the
+        distribution is interrupted, use staged_commit.py to resume or roll back.
+        :return: number of reports saved
+        """
+        commit = StagedCommit(self.latte_path)
+        with self.profile.phase("stage"):
+            commit.stage((self.report_path(grading_name),
+                          self.generate_report(grading_name.replace(",", ", "), feedback))
+                         for grading_name, feedback in self.all_info.items())
+        with self.profile.phase("publish"):
+            counter = commit.publish()
+        self.profile.count("reports saved", counter)
+        return counter
+
+    def save_report(self, path: str, report: str):
+        """
+        save a single report to path, recording the time taken and the amount written in self.profile
+        """
+        self.save_reports([path], [report])
+
+    def save_reports(self, paths: list, reports: list, encodings=None):
+        """
+        save the reports of one student in all formats together, counted as one report in self.profile
+        :param encodings: encoding of each report file, as in write_report; the locale's for all if not given
+        """
+        with self.profile.phase("write"):
+            for path, report, encoding in zip(paths, reports, encodings or [None] * len(paths)):
+                write_report(path, report, encoding)
+        self.profile.count("reports saved")
+        if self.profile.detailed:
+            self.profile.count("bytes written", sum(len(report.encode("utf-8")) for report in reports))
+
     def generate_file_name(self, grading_name: str) -> str:
         return "%s_%s_Grade_Feedback.txt" % (self.conv_dict[grading_name].replace(" ", "_"), self.assn_alias)
 
+    def file_names(self, grading_name: str) -> list:
+        """
+        :return: file names of the given student's reports, in the order of self.formats
+        """
+        file_name = self.generate_file_name(grading_name)
+        if self.formats == (DEFAULT_FORMAT,):
+            return [file_name]
+        base = os.path.splitext(file_name)[0]
+        return [base + RENDERERS[name].extension for name in self.formats]
+
+    def report_path(self, grading_name: str) -> str:
+        """
+        :return: path where the report of the given student will be saved
+        """
+        return os.path.join(self.folder_of(grading_name), self.generate_file_name(grading_name))
+
+    def report_paths(self, grading_name: str) -> list:
+        """
+        :return: paths where the reports of the given student will be saved, in the order of self.formats
+        """
+        report_path = self.report_path(grading_name)
+        if self.formats == (DEFAULT_FORMAT,):
+            return [report_path]
+        base = os.path.splitext(report_path)[0]
+        return [base + RENDERERS[name].extension for name in self.formats]
+
+    def record_saved_reports(self):
+        """
+        record reports saved by the last distribution in self.snapshot and save the snapshot
+        """
+        failed = getattr(self, "failed_reports", {})
+        saved = self.changed_reports if hasattr(self, "changed_reports") else self.all_info
+        self.snapshot.record_files((path for grading_name in saved if grading_name not in failed
+                                    for path in self.report_paths(grading_name)),
+                                   current=getattr(self, "snapshot_current", ()))
+        self.snapshot.save()
+
+    def report_exists(self, save_dir: str, file_name: str) -> bool:
+        """
+        :return: whether a file with the report's file name already exists in save_dir
+        """
+        if self.snapshot is not None:
+            return self.snapshot.has_file(save_dir, file_name)
+        return os.path.exists(os.path.join(save_dir, file_name))
+
+    def iter_rows(self):
+        """
+        :return: iterable of (grading name, entry) of all students, in sheet order
+        """
+        return self.all_info.items()
+
+    def compute_statistics(self) -> list:
+        """
+        compute class statistics of every scored item (see grade_stats.py) over all students, into self.stats
+        :return: list of grade_stats.ItemStats, in item order
+        """
+        from grade_stats import compute_item_stats
+        with self.profile.phase("statistics"):
+            self.stats = compute_item_stats(self.items, (entry for _, entry in self.iter_rows()))
+        self.profile.count("scored items", len(self.stats))
+        return self.stats
+
+    def add_class_context(self):
+        """
+        append the class mean and median of every scored item to each student's report, computed once for all reports
+        """
+        if not hasattr(self, "stats"):
+            self.compute_statistics()
+        self.template.set_context(ContextLine(item.label, item.level, item.mean, item.median,
+                                              self.items[item.index].suffix) for item in self.stats)
+
+    def save_statistics(self, path: str):
+        """
+        save class statistics (computed first if needed) to a .csv or .json file
+        """
+        from grade_stats import write_stats
+        if not hasattr(self, "stats"):
+            self.compute_statistics()
+        write_stats(self.stats, path, assignment_name=self.assignment_name, students=len(self.all_info))
+
+    def total_columns(self) -> list:
+        """
+        :return: indices of the items adding up to a student's total: the last scored item with "total" in its name
+        if any, otherwise all scored items that are not indented
+        """
+        scored = [i for i, item in enumerate(self.items) if item.suffix and not item.is_comment]
+        totals = [i for i in scored if "total" in self.items[i].prefix.lower()]
+        if totals:
+            return totals[-1:]
+        return [i for i in scored if not self.items[i].prefix.startswith(" ")]
+
+    def sample_rows(self, k=1, names=None, stratified=False) -> list:
+        """
+        pick rows to preview in one pass over the sheet, without copying it
+        :param k: number of rows
+        :param names: grading names of the rows to pick instead, in this order
+        :param stratified: pick the rows with the lowest and highest totals (see total_columns) instead of random
+        rows, half of them each; rows whose total is not a number are skipped
+        :return: list of (grading name, entry)
+        """
+        if names:
+            wanted = set(names)
+            found = dict((grading_name, entry) for grading_name, entry in self.iter_rows() if grading_name in wanted)
+            missing = [name for name in names if name not in found]
+            if missing:
+                raise KeyError("Cannot find student \"%s\" on the grading sheet. Names must be written as on the sheet, "
+                               "e.g. \"Lee,Mary\"." % missing[0])
+            return [(name, found[name]) for name in names]
+
+        if stratified:
+            columns = self.total_columns()
+
+            def totals():
+                for grading_name, entry in self.iter_rows():
+                    try:
+                        yield sum(float(entry[i]) for i in columns), grading_name, entry
+                    except ValueError:
+                        continue
+
+            lowest = heapq.nsmallest((k + 1) // 2, totals(), key=lambda row: row[0])
+            highest = heapq.nlargest(k // 2, totals(), key=lambda row: row[0])
+            lowest_names = set(grading_name for _, grading_name, _ in lowest)
+            picked = lowest + [row for row in highest if row[1] not in lowest_names]
+            return [(grading_name, entry) for _, grading_name, entry in picked]
+
+        # reservoir sampling, so that the number of rows need not be known in advance
+        sample = []
+        for count, row in enumerate(self.iter_rows()):
+            if count < k:
+                sample.append(row)
+            else:
+                index = random.randrange(count + 1)
+                if index < k:
+                    sample[index] = row
+        return sample
+
+    def random_row(self) -> tuple:
+        """
+        :return: (grading name, entry) of a randomly selected student
+        """
+        return self.sample_rows(1)[0]
+
+
+class StreamingGradesOut(GradesOut):
+    """
+    GradesOut for very large .csv grading sheets: instead of loading the whole sheet, rows are read from file in chunks
+    of chunk_size, matched to their folders, rendered and saved before the next chunk is read, so that memory use
+    does not grow with the number of rows. Only the student names are kept, to detect duplicated rows.
+    """
+
+    def __init__(self, student_folder_path: str, file_name: str, assn_alias="submission", verbose=True,
+                 disable_not_found=False, chunk_size=STREAM_CHUNK_SIZE, profile=None):
+        # record assignment shorthand
+        self.assn_alias = assn_alias
+        self.profile = profile if profile is not None else RunProfile()
+        self.disable_not_found = disable_not_found
+        self.chunk_size = chunk_size
+        self.snapshot = None
+
+        # record path to latte folder
+        if os.path.isdir(student_folder_path):
+            self.latte_path = student_folder_path
+        else:
+            raise ValueError("Cannot find directory %s." % student_folder_path)
+
+        if not file_name.lower().endswith(".csv"):
+            raise ValueError("Only .csv grading sheets can be streamed, got %s" % file_name)
+        if not os.path.exists(file_name):
+            raise FileNotFoundError("Cannot find grading sheet file %s" % file_name)
+
+        if verbose:
+            print("Reading grading sheet header from %s..." % file_name, end="")
+        # parse header rows only; student rows are read when needed
+        with self.profile.phase("load sheet"):
+            self.sheet = CsvSheet(file_name, NAME_COL, NAME_VALUES_TO_DROP, assn_alias)
+        self.assignment_name = self.sheet.assignment_name
+        if verbose:
+            print(" Done!")
+
+        # ensure there's no duplicate Columns
+        check_duplicate_columns(self.sheet.header, file_name)
+
+        # index all immediate subdirectories under the given path by LATTE name, this time with full relative path
+        with self.profile.phase("index folders"):
+            self.folder_index = FolderIndex.from_directory(self.latte_path)
+
+        # load name conversion dictionary
+        with self.profile.phase("load names"):
+            self.conv_dict = load_conversion_dict()
+
+        # generate grade items and compile report layout
+        with self.profile.phase("compile template"):
+            self.item_names = self.sheet.header[1:]
+            self.items, item_stats = parse_header_row(self.item_names)
+            self.template = ReportTemplate(self.items, REPORT_TITLE, self.assignment_name)
+        self.profile.count("items", len(self.items))
+        self.profile.count("item cache hits", item_stats.hits)
+
+    def iter_chunks(self):
+        """
+        generate lists of at most chunk_size (grading name, entry) rows, read from grading sheet
+        """
+        seen = set()
+        rows = iter(self.sheet)
+        while True:
+            with self.profile.phase("load sheet"):
+                chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                return
+            for grading_name, _ in chunk:
+                if grading_name in seen:
+                    raise ValueError("Student name \"%s\" appears in more than one row of the grading sheet. "
+                                     "Please remove or rename the duplicated rows." % grading_name)
+                seen.add(grading_name)
+            yield chunk
+
+    def iter_resolved(self, chunks):
+        """
+        match each row of each chunk to its student folder
+        :return: generator of lists of (grading name, entry, report path)
+        """
+        for chunk in chunks:
+            with self.profile.phase("match folders"):
+                resolved = [(grading_name, entry, self.report_path(grading_name)) for grading_name, entry in chunk]
+            yield resolved
+
+    def iter_rendered(self, chunks):
+        """
+        generate report of each row of each chunk
+        :return: generator of lists of (grading name, report path, report)
+        """
+        for chunk in chunks:
+            with self.profile.phase("render"):
+                reports = self.template.render_all((grading_name.replace(",", ", "), entry)
+                                                   for grading_name, entry, _ in chunk)
+            yield [(grading_name, path, report) for (grading_name, _, path), report in zip(chunk, reports)]
+
+    def report_path(self, grading_name: str) -> str:
+        return os.path.join(self.match_name_to_folder(grading_name.strip(), disable_not_found=self.disable_not_found),
+                            self.generate_file_name(grading_name))
+
+    def iter_rows(self):
+        return iter(self.sheet)
+
+    def match_folders(self):
+        # rows are only matched to folders while streaming through the sheet
+        pass
+
+    def validate_files(self, warning_only=False, names=None):
+        """
+        Run this method to make sure no report exists before generation, streaming through the sheet once
+        :return:
+        """
+        # total number of files to be overwritten
+        counter = 0
+
+        for chunk in self.iter_resolved(self.iter_chunks()):
+            for grading_name, _, path in chunk:
+                if names is not None and grading_name not in names:
+                    continue
+                if os.path.exists(path):
+                    if warning_only:
+                        print("File %s already exists in %s. It will be overwritten by the program."
+                              % os.path.split(path)[::-1])
+                        counter += 1
+                    else:
+                        raise FileExistsError("File %s already exists in %s. Consider deleting or renaming."
+                                              % os.path.split(path)[::-1])
+
+        # in the end, report total # of files to overwrite, if allowed and overwritten exists
+        if counter != 0:
+            print("Total number of files to be overwritten: %d" % counter)
+
+    def distribute_grade(self, workers=1, render_processes=False, staged=False, incremental=False,
+                         async_concurrency=0, archive=None):
+        """
+        distributes grades to student LATTE folders, one chunk of rows at a time. With more than 1 worker, each chunk
+        is saved by a pool of threads and failed reports are recorded in self.failed_reports.
+        :return: number of reports saved
+        """
+        if render_processes or staged or incremental or async_concurrency or archive:
+            raise ValueError("Streaming distribution only supports saving reports directly, optionally with workers.")
+
+        self.failed_reports = OrderedDict()
+        counter = 0
+        rendered = self.iter_rendered(self.iter_resolved(self.iter_chunks()))
+
+        if workers <= 1:
+            for chunk in rendered:
+                for _, path, report in chunk:
+                    self.save_report(path, report)
+                    counter += 1
+            return counter
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for chunk in rendered:
+                futures = [(grading_name, pool.submit(self.save_report, path, report))
+                           for grading_name, path, report in chunk]
+                for grading_name, future in futures:
+                    exc = future.exception()
+                    if exc is None:
+                        counter += 1
+                    else:
+                        self.failed_reports[grading_name] = "%s: %s" % (type(exc).__name__, str(exc))
+
+        return counter
+
+
+def print_report_preview(go: GradesOut, grading_name: str, entry):
+    """
+    print where the report of the given student will be saved, and the report itself
+    """
+    # show where the report will be saved
+    print("-" * 20 + "\nThe following report will be generated and saved as %s: \n" %
+          ", ".join(go.report_paths(grading_name)))
+
+    # generate the main report, in the first format saved
+    print(go.render_formats(grading_name.replace(",", ", "), entry)[0])
+
+    print("-" * 20)
+
+
+def confirm_distribution(go: GradesOut):
+    """
+    let the user preview random reports and confirm before saving them; exits the program if the user says so
+    :param go: GradesOut ready for distribution
+    """
+    print("Please examine the prompts above carefully. No reports have been generated yet.\n"
+          "Enter \"exit\" if you wish to exit the program. \n"
+          "Otherwise, enter anything else to preview the reports before they are saved.")
+    pre_answer = input(">")
+
+    if pre_answer.strip().lower() == "exit":
+        print("OK. No reports have been generated or saved.")
+        sys.exit()
+
+    # print a random report for user to preview before saving the changes
+    def print_random_report():
+        print("\nPreviewing report output. No reports will be saved until you approve it in the next question. ")
+        print_report_preview(go, *go.random_row())
+
+    # preview report for user
+    print_random_report()
+
+    answer = ""
+
+    while answer.lower().strip() != "yes":
+        answer = input("Enter \"yes\" to proceed to generating and saving all reports to student folders.\n"
+                       "Enter \"exit\" to exit program without generating any reports.\n"
+                       "Enter anything else to see another randomly selected sample.\n>")
+        if answer.lower().strip() == "exit":
+            # if explicitly stated to exit
+            print("OK. No reports have been generated or saved.")
+            sys.exit()
+        elif answer.lower().strip() != "yes":
+            # if command not recognized, preview a report for user
+            print_random_report()
+
 
 def main():
     try:
@@ -300,64 +1135,158 @@ def main():
         parser.add_argument("--sheet_name", type=str, default=None,
                             help="required for .xlsx files only. Specify name of a specific sheet after this argument. ("
                                  "e.g. --sheet_name A1.print)")
+        parser.add_argument("--from_store", action="store_true",
+                            help="read the grading sheet from the store imported with grade_store.py (under "
+                                 "conv/stores) instead of parsing grading_sheet_file again. A .gstore file can also be "
+                                 "given directly as grading_sheet_file.")
+        parser.add_argument("--no_sheet_cache", action="store_true",
+                            help="for .xlsx files, always parse the sheet instead of reusing the sheet parsed in a "
+                                 "previous run (cached under conv/sheet_cache).")
+        parser.add_argument("-y", "--yes", action="store_true",
+                            help="do not ask for confirmation or preview reports; save all reports right away. Useful "
+                                 "for scripts.")
+        parser.add_argument("--stream", action="store_true",
+                            help="for very large .csv files, read, generate and save reports a few hundred rows at a "
+                                 "time instead of loading the whole grading sheet. Cannot be combined with --staged, "
+                                 "--incremental, --render_processes, --async_writes or --archive.")
+        parser.add_argument("--snapshot", action="store_true",
+                            help="look up student folders and existing reports in a snapshot of the LATTE parent "
+                                 "folder kept under conv/snapshots, only rescanning folders that changed since the "
+                                 "last run. Not used with --stream.")
+        parser.add_argument("--preview", type=int, default=0,
+                            help="right after loading the grading sheet, show this many randomly picked reports, "
+                                 "before all students are matched to folders and checked. Useful to catch formatting "
+                                 "problems early on large sheets.")
+        parser.add_argument("--preview_name", type=str, action="append", default=None,
+                            help="show the report of this student right after loading the grading sheet, with the "
+                                 "name as on the sheet (e.g. --preview_name \"Lee,Mary\"). Can be repeated.")
+        parser.add_argument("--preview_stratified", action="store_true",
+                            help="with --preview, show the reports with the lowest and highest totals instead of "
+                                 "random ones (at least one of each).")
         parser.add_argument("-a", "--allow_overwrite", action="store_true",
                             help="allow program to overwrite existing feedback files with the same name as this program "
                                  "generates.")
         parser.add_argument("--disable_not_found", action="store_true",
                             help="for students with no LATTE submission folders, disable program to save their reports under"
                                  "LATTE parent directory and raise exception instead.")
+        parser.add_argument("--workers", type=int, default=1,
+                            help="number of threads used to save reports in parallel (default 1, i.e. one at a time). "
+                                 "With more than 1 worker, reports that fail to save are listed in a summary at the end "
+                                 "instead of stopping the distribution.")
+        parser.add_argument("--render_processes", action="store_true",
+                            help="with --workers, also generate reports in a pool of worker processes. Only worth it "
+                                 "for very large grading sheets.")
+        parser.add_argument("--staged", action="store_true",
+                            help="save all reports to a staging folder first and then move them into student folders, "
+                                 "so that an interrupted distribution can be resumed or rolled back with "
+                                 "staged_commit.py instead of being cleaned up by hand.")
+        parser.add_argument("-i", "--incremental", action="store_true",
+                            help="only save reports that changed since the last run with the same assignment alias, "
+                                 "as recorded under conv/. Other options for saving reports are ignored.")
+        parser.add_argument("--async_writes", type=int, default=0,
+                            help="save reports with the asyncio engine, with at most this many writes in flight, "
+                                 "retrying writes that fail with transient errors. Meant for slow network shares. "
+                                 "Reports that still fail are listed in a summary at the end. Ignored with --workers.")
+        parser.add_argument("--archive", type=str, default=None,
+                            help="save all reports into the given .zip file instead of the student folders, with one "
+                                 "folder per student as expected by LATTE's \"Upload multiple feedback files in a "
+                                 "zip\". Other options for saving reports are ignored.")
+        parser.add_argument("--formats", type=str, nargs="+", default=[DEFAULT_FORMAT], choices=list(RENDERERS),
+                            help="save each report in these formats (default: %s only), all generated from the same "
+                                 "model of the report in one pass, e.g. --formats txt html. Only with the default "
+                                 "way of saving reports or --archive." % DEFAULT_FORMAT)
+        parser.add_argument("--stats", type=str, default=None,
+                            help="save the class count, mean, median, standard deviation, range and histogram of "
+                                 "every scored item (those with a total like /5 in their header) to the given .csv or "
+                                 ".json file.")
+        parser.add_argument("--class_context", action="store_true",
+                            help="append the class mean and median of every scored item to each report.")
+        parser.add_argument("--profile", action="store_true",
+                            help="print the wall-clock and CPU time of each phase (loading the sheet, matching folders, "
+                                 "generating and saving reports, ...), counters and peak memory at the end.")
+        parser.add_argument("--profile_json", type=str, default=None,
+                            help="save the same measurements as --profile to the given .json file.")
+        parser.add_argument("--cprofile", type=str, default=None,
+                            help="run the program under cProfile and save the statistics to the given file, to be "
+                                 "read with pstats or snakeviz. Best combined with --yes.")
 
         args = parser.parse_args()
+        if args.stream and (args.incremental or args.staged or args.archive or args.render_processes or
+                            args.async_writes):
+            parser.error("--stream cannot be combined with --incremental, --staged, --archive, --render_processes "
+                         "or --async_writes.")
+        if args.formats != [DEFAULT_FORMAT] and (args.stream or (not args.archive and (
+                args.staged or args.incremental or args.workers > 1 or args.async_writes))):
+            parser.error("--formats other than %s cannot be combined with --stream, --staged, --incremental, "
+                         "--workers or --async_writes." % DEFAULT_FORMAT)
+        if args.stream and (args.stats or args.class_context):
+            parser.error("--stats and --class_context need the whole grading sheet and cannot be combined with "
+                         "--stream.")
+
+        if args.cprofile:
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+        profile = RunProfile(detailed=bool(args.profile or args.profile_json))
 
         # instantiate a GradesOut object from user input
-        go = GradesOut(args.student_folder, args.grading_sheet_file, assn_alias=args.assignment_alias,
-                       sheet_name=args.sheet_name, disable_not_found=args.disable_not_found)
+        if args.stream:
+            go = StreamingGradesOut(args.student_folder, args.grading_sheet_file, assn_alias=args.assignment_alias,
+                                    disable_not_found=args.disable_not_found, profile=profile)
+        else:
+            snapshot = None
+            if args.snapshot:
+                with profile.phase("load snapshot"):
+                    snapshot = DirectorySnapshot.load(args.student_folder)
+            sheet_file = args.grading_sheet_file
+            if args.from_store:
+                from grade_store import default_store_path
+                sheet_file = default_store_path(sheet_file, args.sheet_name)
+            go = GradesOut(args.student_folder, sheet_file, assn_alias=args.assignment_alias,
+                           sheet_name=args.sheet_name, disable_not_found=args.disable_not_found,
+                           sheet_cache=not args.no_sheet_cache, snapshot=snapshot, profile=profile,
+                           match_folders=False, formats=args.formats)
+
+        # class statistics over the whole sheet, before any report is generated
+        if args.stats or args.class_context:
+            go.compute_statistics()
+            if args.class_context:
+                go.add_class_context()
+
+        # quick preview of a few reports, only matching their students to folders
+        if args.preview or args.preview_name or args.preview_stratified:
+            with profile.phase("preview"):
+                rows = go.sample_rows(k=max(args.preview, 2) if args.preview_stratified else args.preview,
+                                      names=args.preview_name, stratified=args.preview_stratified)
+            print("\nQuick preview of %d reports, before checking all students. No reports have been generated yet."
+                  % len(rows))
+            for grading_name, entry in rows:
+                print_report_preview(go, grading_name, entry)
 
-        # check if file name conflict exists
-        go.validate_files(warning_only=args.allow_overwrite)
+        # ensure all names have one and only one corresponding directory
+        go.match_folders()
+
+        # reports only go into the archive, so only the archive itself can conflict
+        if args.archive:
+            if os.path.exists(args.archive):
+                if not args.allow_overwrite:
+                    raise FileExistsError("File %s already exists. Consider deleting or renaming." % args.archive)
+                print("File %s already exists. It will be overwritten by the program." % args.archive)
+        # check if file name conflict exists, only among changed reports for incremental distribution
+        elif args.incremental:
+            go.plan_incremental()
+            print("Reports changed since last distribution: %d changed / %d unchanged" %
+                  (len(go.changed_reports), go.unchanged_count))
+            with profile.phase("validate"):
+                go.validate_files(warning_only=args.allow_overwrite, names=go.changed_reports)
+        else:
+            with profile.phase("validate"):
+                go.validate_files(warning_only=args.allow_overwrite)
 
         # Pause to let the user examine the prompt, enter any string to continue.
         print("-" * 20)
-        print("Please examine the prompts above carefully. No reports have been generated yet.\n"
-              "Enter \"exit\" if you wish to exit the program. \n"
-              "Otherwise, enter anything else to preview the reports before they are saved.")
-        pre_answer = input(">")
-
-        if pre_answer.strip().lower() == "exit":
-            print("OK. No reports have been generated or saved.")
-            sys.exit()
-
-        # print a random report for user to preview before saving the changes
-        def print_random_report():
-            print("\nPreviewing report output. No reports will be saved until you approve it in the next question. ")
-            sample_name, sample_entry = random.choice(list(go.all_info.items()))
-
-            # show where the report will be saved
-            print("-" * 20 + "\nThe following report will be generated and saved as %s: \n" %
-                  os.path.join(go.save_dir[sample_name], go.generate_file_name(sample_name)))
-
-            # generate the main report
-            print(go.generate_report(sample_name.replace(",", ", "), sample_entry))
-
-            print("-" * 20)
-
-        # preview report for user
-        print_random_report()
-
-        answer = ""
-
-        while answer.lower().strip() != "yes":
-            answer = input("Enter \"yes\" to proceed to generating and saving all reports to student folders.\n"
-                           "Enter \"exit\" to exit program without generating any reports.\n"
-                           "Enter anything else to see another randomly selected sample.\n>")
-            if answer.lower().strip() == "exit":
-                # if explicitly stated to exit
-                print("OK. No reports have been generated or saved.")
-                sys.exit()
-            elif answer.lower().strip() != "yes":
-                # if command not recognized, preview a report for user
-                print_random_report()
-
+        if not args.yes:
+            confirm_distribution(go)
 
     except Exception as exc:
         print("An error happened while preparing for report distribution:\n"
@@ -367,17 +1296,59 @@ def main():
 
     try:
         # finally, distribute the output!
-        print("Distributing grade to student folders...", end="")
-        num_saved = go.distribute_grade()
+        if args.archive:
+            print("Saving reports to %s..." % args.archive, end="")
+        else:
+            print("Distributing grade to student folders...", end="")
+        num_saved = go.distribute_grade(workers=args.workers, render_processes=args.render_processes,
+                                        staged=args.staged, incremental=args.incremental,
+                                        async_concurrency=0 if args.workers > 1 else args.async_writes,
+                                        archive=args.archive)
         print("Done!")
         print("Total number of reports saved: %d" % num_saved)
+        if args.incremental and not args.archive:
+            print("%d changed / %d unchanged" % (num_saved, go.unchanged_count))
+
+        if args.stats:
+            go.save_statistics(args.stats)
+            print("Class statistics of %d scored items saved to %s" % (len(go.stats), args.stats))
+
+        # keep snapshot up to date with the reports just saved
+        if go.snapshot is not None and not args.archive:
+            with profile.phase("save snapshot"):
+                go.record_saved_reports()
+
+        # with parallel or async distribution, failed reports are summarized instead of stopping the program
+        if getattr(go, "failed_reports", None):
+            print("Total number of reports that failed to save: %d" % len(go.failed_reports))
+            for grading_name, error in go.failed_reports.items():
+                print("\t%s: %s" % (grading_name, error))
     except Exception as exc:
+        if args.staged:
+            print("An error happened during report distribution:\n"
+                  "\"%s: %s\"\n"
+                  "The program has ended. Run \"python staged_commit.py %s status\" to check progress, then \"... "
+                  "resume\" to save the remaining reports or \"... rollback\" to undo the saved ones."
+                  % (type(exc).__name__, str(exc), args.student_folder))
+            sys.exit()
         print("An error happened during report distribution:\n"
               "\"%s: %s\"\n"
               "The program has ended. It is possible that some reports have been created. Please check the LATTE "
               "directories to remove any unwanted files, or use the --allow_overwrite option to overwrite them in the "
               "next command." % (type(exc).__name__, str(exc)))
         sys.exit()
+    finally:
+        # failed runs are profiled as well, as they are the ones most worth looking into
+        if args.profile:
+            print("-" * 20)
+            print(profile.summary())
+        if args.profile_json:
+            profile.write_json(args.profile_json)
+            print("Profile saved at %s" % args.profile_json)
+        if args.cprofile:
+            profiler.disable()
+            profiler.dump_stats(args.cprofile)
+            print("cProfile statistics saved at %s" % args.cprofile)
 
 
 if __name__ == "__main__":
@@ -5,8 +5,9 @@
 Requires: grading item titles (e.g. "Pt. 1 Derivation for (1)") and grader feedback
 """
 
-
-from re import findall, sub
+import re
+from collections import OrderedDict, namedtuple
+from threading import Lock
 
 __author__ = 'Yonglin Wang'
 __version__ = '0.1.0'
@@ -25,8 +26,18 @@ SPACES_PER_INDENT = 4
 
 # ###Regex for extracting total score from item
 SCORE_PATTERN = r"\s+\/\d*\.?\d+"
+SCORE_REGEX = re.compile(SCORE_PATTERN)
+
+# ###Maximum number of parsed items kept in cache, by raw header text
+ITEM_CACHE_SIZE = 4096
+
+# ###Cache statistics of a parsed header row
+HeaderStats = namedtuple("HeaderStats", ["hits", "misses"])
+
 
 class GradingItem:
+    __slots__ = ("is_comment", "prefix", "suffix")
+
     def __init__(self, item: str):
         self.is_comment = False
         self.prefix = ""
@@ -50,7 +61,7 @@ class GradingItem:
             self.is_comment = True
         else:
             # check if ends with total score
-            score = findall(SCORE_PATTERN, item)
+            score = SCORE_REGEX.findall(item)
             if score:
                 # record suffix (taking off surrounding white space)
                 s = score[-1].strip()
@@ -61,6 +72,15 @@ class GradingItem:
         # lastly, add prefix
         self.prefix += item.replace("\n", " ")
 
+    @classmethod
+    def from_parts(cls, prefix: str, suffix: str, is_comment: bool):
+        """
+        :return: GradingItem with the given attributes of an item parsed before, e.g. saved in a grade store
+        """
+        item = cls.__new__(cls)
+        item.prefix, item.suffix, item.is_comment = prefix, suffix, is_comment
+        return item
+
     def insert_info(self, info: str):
         """
         generate specific report string with given info, which ends with a linebreak
@@ -78,6 +98,61 @@ class GradingItem:
 
         return "%s: %s%s\n" % (self.prefix, info.strip(), self.suffix)
 
+
+class ItemCache:
+    """
+    least recently used cache of parsed GradingItems by raw header text, shared by all grading sheets in a process.
+    Cached items are shared, so they must not be modified.
+    """
+
+    def __init__(self, maxsize=ITEM_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = Lock()
+
+    def get(self, header: str) -> tuple:
+        """
+        :return: (GradingItem of header, whether it was found in cache)
+        """
+        with self._lock:
+            item = self.items.get(header)
+            if item is not None:
+                self.items.move_to_end(header)
+                self.hits += 1
+                return item, True
+
+        item = GradingItem(header)
+        with self._lock:
+            self.items[header] = item
+            if len(self.items) > self.maxsize:
+                self.items.popitem(last=False)
+            self.misses += 1
+        return item, False
+
+    def clear(self):
+        with self._lock:
+            self.items.clear()
+            self.hits = self.misses = 0
+
+
+ITEM_CACHE = ItemCache()
+
+
+def parse_header_row(headers) -> tuple:
+    """
+    get GradingItems of a whole header row, reusing items parsed before from the same header text
+    :param headers: iterable of item headers, e.g. all columns of a grading sheet except Name
+    :return: (list of GradingItem in the same order as headers, HeaderStats of this row)
+    """
+    items, hits = [], 0
+    for header in headers:
+        item, hit = ITEM_CACHE.get(header)
+        items.append(item)
+        hits += hit
+    return items, HeaderStats(hits, len(items) - hits)
+
 if __name__ == "__main__":
     gi = GradingItem('>Pt 1\n(1-2)\n  \n/.5')
     print(gi.insert_info("0.4"))
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""job_runner.py: distribute reports of many assignments in one run, without prompts
+Requires: a job file (.csv or .toml) listing, for each assignment, the LATTE parent folder, grading sheet file,
+assignment alias and (for .xlsx) sheet name, i.e. the arguments of grades_out.py.
+The name conversion table is loaded once, and each LATTE parent folder is indexed once, for all jobs.
+"""
+
+# Built-in/Generic Imports
+import csv
+import threading
+from argparse import ArgumentParser
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Own modules
+from folder_index import FolderIndex
+from grades_out import GradesOut, load_conversion_dict
+
+__author__ = 'Yonglin Wang'
+__version__ = '0.1.0'
+__maintainer__ = 'Yonglin Wang'
+__email__ = 'yonglinw@brandeis.edu'
+
+# ###Fields of each job, same as the arguments of grades_out.py; sheet_name is only required for .xlsx files
+JOB_FIELDS = ["student_folder", "grading_sheet_file", "assignment_alias", "sheet_name"]
+
+
+def read_jobs(f_path: str) -> list:
+    """
+    read jobs from a .csv file with JOB_FIELDS as header, or a .toml file with a [[job]] table per job
+    :param f_path: path to job file
+    :return: list of dictionaries with JOB_FIELDS as keys
+    """
+    if f_path.lower().endswith(".csv"):
+        with open(f_path, newline="", encoding="utf-8-sig") as f:
+            jobs = list(csv.DictReader(f))
+    elif f_path.lower().endswith(".toml"):
+        try:
+            import tomllib
+        except ImportError:
+            raise ValueError("Reading .toml job files requires Python 3.11 or above. Please use a .csv job file.")
+        with open(f_path, "rb") as f:
+            jobs = tomllib.load(f).get("job", [])
+    else:
+        raise ValueError("Cannot recognize file suffix of %s" % f_path)
+
+    for line_num, job in enumerate(jobs, 1):
+        missing = [field for field in JOB_FIELDS[:3] if not job.get(field)]
+        if missing:
+            raise ValueError("Job %d in %s is missing %s." % (line_num, f_path, ", ".join(missing)))
+        job["sheet_name"] = job.get("sheet_name") or None
+
+    return jobs
+
+
+class JobRunner:
+    """
+    runs grades_out.py jobs in one process, sharing the name conversion dictionary and folder indexes across jobs
+    """
+
+    def __init__(self, allow_overwrite=False, disable_not_found=False, workers=1):
+        self.allow_overwrite = allow_overwrite
+        self.disable_not_found = disable_not_found
+        self.workers = workers
+        self.conv_dict = load_conversion_dict()
+        self.folder_indexes = {}
+        self._index_lock = threading.Lock()
+
+    def get_folder_index(self, student_folder: str) -> FolderIndex:
+        with self._index_lock:
+            if student_folder not in self.folder_indexes:
+                self.folder_indexes[student_folder] = FolderIndex.from_directory(student_folder)
+            return self.folder_indexes[student_folder]
+
+    def run_job(self, job: dict) -> int:
+        """
+        validate and distribute the reports of one job
+        :return: number of reports saved
+        """
+        go = GradesOut(job["student_folder"], job["grading_sheet_file"], assn_alias=job["assignment_alias"],
+                       sheet_name=job["sheet_name"], verbose=False, disable_not_found=self.disable_not_found,
+                       conv_dict=self.conv_dict, folder_index=self.get_folder_index(job["student_folder"]))
+        go.validate_files(warning_only=self.allow_overwrite)
+        num_saved = go.distribute_grade(workers=self.workers)
+
+        failed = getattr(go, "failed_reports", None)
+        if failed:
+            raise RuntimeError("%d reports saved, %d failed: %s" % (num_saved, len(failed), "; ".join(
+                "%s (%s)" % item for item in failed.items())))
+        return num_saved
+
+    def run_all(self, jobs: list, job_workers=1) -> OrderedDict:
+        """
+        run all jobs, one after another or job_workers at a time. A failed job does not stop the others.
+        :return: {job number: number of reports saved, or the exception that stopped the job}
+        """
+        def run(job):
+            try:
+                return self.run_job(job)
+            except Exception as exc:
+                return exc
+
+        if job_workers > 1:
+            with ThreadPoolExecutor(max_workers=job_workers) as pool:
+                results = list(pool.map(run, jobs))
+        else:
+            results = [run(job) for job in jobs]
+
+        return OrderedDict(enumerate(results, 1))
+
+
+def main():
+    parser = ArgumentParser(prog="job_runner.py",
+                            description="Distribute reports of many assignments in one run, without prompts. Each job "
+                                        "is validated and distributed as grades_out.py would with --yes.")
+    parser.add_argument("job_file", help=".csv file with columns %s (one job per row), or .toml file with one [[job]] "
+                                         "table per job with the same keys." % ", ".join(JOB_FIELDS))
+    parser.add_argument("-a", "--allow_overwrite", action="store_true",
+                        help="allow program to overwrite existing feedback files, for all jobs.")
+    parser.add_argument("--disable_not_found", action="store_true",
+                        help="raise exception for students with no LATTE submission folders instead of saving their "
+                             "reports under LATTE parent directory, for all jobs.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of threads used to save reports of each job in parallel.")
+    parser.add_argument("--job_workers", type=int, default=1,
+                        help="number of jobs to run at the same time (default 1, i.e. one after another).")
+    args = parser.parse_args()
+
+    jobs = read_jobs(args.job_file)
+    runner = JobRunner(allow_overwrite=args.allow_overwrite, disable_not_found=args.disable_not_found,
+                       workers=args.workers)
+    results = runner.run_all(jobs, job_workers=args.job_workers)
+
+    print("-" * 20)
+    for job_num, result in results.items():
+        job = jobs[job_num - 1]
+        if isinstance(result, Exception):
+            print("Job %d (%s, %s): failed with \"%s: %s\"" % (job_num, job["assignment_alias"], job["student_folder"],
+                                                              type(result).__name__, str(result)))
+        else:
+            print("Job %d (%s, %s): %d reports saved" % (job_num, job["assignment_alias"], job["student_folder"],
+                                                         result))
+    print("Total number of jobs succeeded: %d of %d" %
+          (sum(not isinstance(result, Exception) for result in results.values()), len(jobs)))
+
+
+if __name__ == "__main__":
+    main()
@@ -6,13 +6,14 @@ Requires a structured folder of student submissions (obtained from LATTE)
 """
 
 # Built-in/Generic Imports
+import csv
+import json
 import os
 from re import findall
 from argparse import ArgumentParser
 
-# Libs
-import pandas as pd
-from nameparser import HumanName
+# Own modules
+from atomic_write import atomic_write
 
 __author__ = 'Yonglin Wang'
 __version__ = '0.1.0'
@@ -27,24 +28,43 @@ LATTE_COL_NAME = "Name on LATTE"
 GRADING_COL_NAME = "Name on Grading Sheet"
 OUTPUT_PATH = "conv/latte_grading_conversion.csv"
 
+# ###Conversions of previous runs, kept across runs: {"converted": {LATTE name: converted grading name},
+# "corrections": {LATTE parent folder: {LATTE name: grading name manually entered in the conversion file}},
+# "folder": LATTE parent folder the conversion file was last generated from}
+CACHE_PATH = "conv/name_cache.json"
+
 TEST_FOLDER = "test_A2"
 
 
-def get_names_in_folder(path: str) -> list:
-    # get all immediate subdirectories under the given path
-    all_subs = [os.path.basename(f.path) for f in os.scandir(path) if f.is_dir()]
+def scan_folder(path: str, snapshot=None) -> tuple:
+    """
+    scan immediate subdirectories under the given path once
+    :param snapshot: dir_snapshot.DirectorySnapshot of path to take subdirectories from, instead of scanning
+    :return: (number of subdirectories, list of LATTE names found in subdirectory names)
+    """
+    # get all immediate subdirectories under the given path; hidden ones are never LATTE folders
+    if snapshot is not None:
+        all_subs = [os.path.basename(f) for f in snapshot.folder_paths()]
+    else:
+        all_subs = [f.name for f in os.scandir(path) if f.is_dir() and not f.name.startswith(".")]
 
-    folders = [findall(r"([ a-zA-Z'-]+)_\d+_assignsubmission_file_", f)[0] for f in all_subs]
+    folders = [findall(FOLDER_NAME_REGEX, f)[0] for f in all_subs]
 
     # exception if no match found
     if not folders:
         raise ValueError("No folder with patter <name>_<digits>_assignsubmission_file_ under directory %s. "
                          "Double check the directory path or change regex in code." % path)
 
-    return folders
+    return len(all_subs), folders
+
+
+def get_names_in_folder(path: str) -> list:
+    return scan_folder(path)[1]
 
 
 def convert_name_for_grading(name: str) -> str:
+    # nameparser takes a while to import, so only import it when converting names
+    from nameparser import HumanName
     hn = HumanName(name)
 
     # Use HumanName to classify parts of names as first, middle, or last (not always accurate)
@@ -54,23 +74,126 @@ def convert_name_for_grading(name: str) -> str:
         return "%s,%s" % (hn.last, hn.first)
 
 
-def generate_csv_from_folder(dir: str):
+def read_conversion_file() -> list:
+    """
+    :return: list of (LATTE name, grading name) in the current conversion file, empty if there is none yet
+    """
+    try:
+        with open(OUTPUT_PATH, newline="", encoding="utf-8-sig") as f:
+            reader = csv.DictReader(f)
+            return [(row[LATTE_COL_NAME], row[GRADING_COL_NAME]) for row in reader]
+    except FileNotFoundError:
+        return []
+
+
+def write_conversion_file(latte_grading_pairs: list):
+    """
+    write the conversion file, sorted by grading name
+    :param latte_grading_pairs: list of (LATTE name, grading name)
+    """
+    with open(OUTPUT_PATH, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, lineterminator=os.linesep)
+        writer.writerow([LATTE_COL_NAME, GRADING_COL_NAME])
+        writer.writerows(sorted(latte_grading_pairs, key=lambda pair: pair[1]))
+
+
+def load_cache() -> dict:
+    try:
+        with open(CACHE_PATH, encoding="utf-8") as f:
+            cache = json.load(f)
+    except (FileNotFoundError, ValueError):
+        cache = {}
+    cache.setdefault("converted", {})
+    cache.setdefault("corrections", {})
+    # corrections of caches without folders cannot be told apart by course
+    if not all(isinstance(folder_corrections, dict) for folder_corrections in cache["corrections"].values()):
+        cache["corrections"] = {}
+    return cache
+
+
+def save_cache(cache: dict):
+    with atomic_write(CACHE_PATH, encoding="utf-8") as f:
+        json.dump(cache, f, indent=1, sort_keys=True, ensure_ascii=False)
+
+
+def convert_names(names: list, workers=1) -> list:
+    """
+    convert LATTE names to grading names, in a pool of worker processes if workers > 1
+    :return: list of grading names in the same order as names
+    """
+    if workers > 1 and len(names) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(convert_name_for_grading, names, chunksize=max(1, len(names) // (workers * 4))))
+    return [convert_name_for_grading(name) for name in names]
+
+
+def generate_csv_from_folder(dir: str, merge=False, workers=1, use_cache=True, snapshot=None):
+    """
+    generate conversion file from LATTE folder names
+    :param dir: path to parent folder of student LATTE folders
+    :param merge: keep all entries of the existing conversion file and only add names of new folders
+    :param workers: number of processes converting names not found in cache
+    :param use_cache: reuse conversions of previous runs and keep manual corrections made in the conversion file for
+    the same LATTE parent folder; otherwise convert all names again, without any corrections
+    :param snapshot: dir_snapshot.DirectorySnapshot of dir, to take folders from instead of scanning dir
+    """
     # submission names: names printed in the submission folder
-    sub_names = get_names_in_folder(dir)
+    num_folders, sub_names = scan_folder(dir, snapshot=snapshot)
 
     # stats: print # of names converted vs total folders
     print("Number of folders under directory %s: %d\n"
           "Number of names found: %d (should be equal to the number of name-containing LATTE folders under the directory)" %
-          (dir, len([f for f in os.scandir(dir) if f.is_dir()]), len(sub_names)))
+          (dir, num_folders, len(sub_names)))
+
+    existing_pairs = read_conversion_file()
+    folder = os.path.abspath(dir)
+    cache = load_cache()
+    if use_cache:
+        converted, corrections = cache["converted"], cache["corrections"].get(folder, {})
+    else:
+        converted, corrections = {}, {}
+
+    # in merge mode, only convert names that are not in the conversion file yet
+    if merge:
+        existing_names = set(latte_name for latte_name, _ in existing_pairs)
+        new_names = [latte_name for latte_name in sub_names if latte_name not in existing_names]
+        print("Number of new names to add to %s: %d" % (OUTPUT_PATH, len(new_names)))
+    else:
+        new_names = sub_names
+
+    if use_cache:
+        # convert names never seen before, including those in the conversion file, to detect manual corrections
+        to_convert = sorted(set(new_names + [latte_name for latte_name, _ in existing_pairs]).difference(converted))
+    else:
+        to_convert = sorted(set(new_names))
+    converted.update(zip(to_convert, convert_names(to_convert, workers=workers)))
+
+    if use_cache:
+        # entries in the conversion file that differ from converted names were corrected by hand, for the folder the
+        # file was generated from
+        source_corrections = cache["corrections"].setdefault(cache.get("folder", folder), {})
+        for latte_name, grading_name in existing_pairs:
+            if grading_name != converted[latte_name]:
+                source_corrections[latte_name] = grading_name
+            else:
+                source_corrections.pop(latte_name, None)
+        corrections = cache["corrections"].get(folder, {})
 
     # output to .csv
-    latte_grading_pairs = [(latte_name, convert_name_for_grading(latte_name)) for latte_name in sub_names]
-    df = pd.DataFrame(latte_grading_pairs, columns=[LATTE_COL_NAME, GRADING_COL_NAME])
-    df = df.sort_values(GRADING_COL_NAME)
-    df.to_csv(OUTPUT_PATH, index=False)
+    latte_grading_pairs = [(latte_name, corrections.get(latte_name, converted[latte_name])) for latte_name in new_names]
+    if merge:
+        latte_grading_pairs += existing_pairs
+    write_conversion_file(latte_grading_pairs)
+
+    # recorded even without cache, so that corrections later made in the new file are kept for this folder
+    cache["converted"].update(converted)
+    cache["folder"] = folder
+    save_cache(cache)
 
     print("Conversion done! Converted names can be found at %s" % OUTPUT_PATH)
 
+
 def main():
     # latte folder: submission folder from LATTE under which <name>_<digits>_assignsubmission_file_ folders are found
     parser = ArgumentParser(prog="name_convert.py",
@@ -85,10 +208,29 @@ def main():
     parser.add_argument("submission_folder", help="relative path from name_convert.py to folder containing all "
                                                   "students' LATTE submission folder with pattern of "
                                                   "<name>_<digits>_assignsubmission_file_.")
+    parser.add_argument("-m", "--merge", action="store_true",
+                        help="keep all entries of the existing conversion file and only add names of folders that "
+                             "are not in it yet.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of processes converting names (default 1). Only names never converted before "
+                             "are converted; others are taken from %s." % CACHE_PATH)
+    parser.add_argument("--no_cache", action="store_true",
+                        help="convert all names again and write the conversion file without the manual corrections "
+                             "recorded in %s, instead of reusing them." % CACHE_PATH)
+    parser.add_argument("--snapshot", action="store_true",
+                        help="take folders from the snapshot of the submission folder kept under conv/snapshots (see "
+                             "dir_snapshot.py), only rescanning it if it changed since the last run.")
 
     args = parser.parse_args()
 
-    generate_csv_from_folder(args.submission_folder)
+    snapshot = None
+    if args.snapshot:
+        from dir_snapshot import DirectorySnapshot
+        snapshot = DirectorySnapshot.load(args.submission_folder)
+        snapshot.save()
+
+    generate_csv_from_folder(args.submission_folder, merge=args.merge, workers=args.workers,
+                             use_cache=not args.no_cache, snapshot=snapshot)
 
 if __name__ == "__main__":
-    generate_csv_from_folder("example_folders")
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""name_match.py: suggest LATTE folders for students on a grading sheet that cannot be matched to one
+A student is unmatched when their name on the sheet is missing from the name conversion file, or when the LATTE name
+it is converted to has no folder. Every LATTE name not claimed by another student is indexed once by the character
+trigrams of its words, so that each unmatched name is only scored against the LATTE names sharing a trigram with it,
+regardless of word order (e.g. "Lee,Mary Ann" against "Mary Ann Lee"). Suggestions are ranked by Dice similarity;
+accepted ones are saved to the conversion file, so that the next run of grades_out.py finds the students.
+"""
+
+# Built-in/Generic Imports
+import re
+import sys
+from argparse import ArgumentParser
+from collections import Counter, defaultdict
+
+# Own modules
+import name_convert
+from grades_out import GradesOut
+
+__author__ = 'Yonglin Wang'
+__version__ = '0.1.0'
+__maintainer__ = 'Yonglin Wang'
+__email__ = 'yonglinw@brandeis.edu'
+
+# ###Default number of suggestions shown per student, and lowest similarity shown at all
+SUGGESTION_LIMIT = 3
+MIN_SIMILARITY = 0.3
+
+# ###Parts of names ignored when comparing, e.g. "[MS]" markers on the grading sheet
+IGNORED_REGEX = re.compile(r"\[.*?\]")
+WORD_REGEX = re.compile(r"[^\W\d_]+")
+
+
+def name_trigrams(name: str) -> set:
+    """
+    :return: character trigrams of the words of name, lowercased, with the start and end of each word marked
+    """
+    words = WORD_REGEX.findall(IGNORED_REGEX.sub(" ", name).lower())
+    return set(word[i:i + 3] for word in ("$%s$" % word for word in words) for i in range(len(word) - 2))
+
+
+class NameIndex:
+    """
+    inverted index {trigram: [ids of names containing it]} over candidate names
+    """
+
+    def __init__(self, names):
+        self.names = []
+        self.sizes = []
+        self.postings = defaultdict(list)
+        for name in names:
+            trigrams = name_trigrams(name)
+            for trigram in trigrams:
+                self.postings[trigram].append(len(self.names))
+            self.names.append(name)
+            self.sizes.append(len(trigrams))
+
+    def __len__(self):
+        return len(self.names)
+
+    def suggest(self, name: str, limit=SUGGESTION_LIMIT, min_similarity=MIN_SIMILARITY, exclude=()) -> list:
+        """
+        :param exclude: candidate names not to suggest, e.g. those already accepted for another student
+        :return: list of (candidate name, similarity between 0 and 1), most similar first
+        """
+        trigrams = name_trigrams(name)
+        shared = Counter()
+        for trigram in trigrams:
+            shared.update(self.postings.get(trigram, ()))
+
+        scored = [(self.names[i], 2 * count / (len(trigrams) + self.sizes[i])) for i, count in shared.items()
+                  if self.names[i] not in exclude]
+        scored = [(candidate, score) for candidate, score in scored if score >= min_similarity]
+        scored.sort(key=lambda pair: (-pair[1], pair[0]))
+        return scored[:limit]
+
+
+def find_unmatched(go: GradesOut) -> tuple:
+    """
+    :return: ({grading name: LATTE name in the conversion file, or None if missing}, list of LATTE names with a folder
+    not matched to any student on the sheet)
+    """
+    unmatched, claimed = {}, set()
+    for grading_name in go.all_info:
+        grading_name = grading_name.strip()
+        latte_name = go.conv_dict.get(grading_name)
+        if latte_name is not None and go.folder_index.lookup(latte_name):
+            claimed.add(latte_name)
+        else:
+            unmatched[grading_name] = latte_name
+    return unmatched, [latte_name for latte_name in go.folder_index.by_name if latte_name not in claimed]
+
+
+def suggest_all(unmatched: dict, index: NameIndex, limit=SUGGESTION_LIMIT, min_similarity=MIN_SIMILARITY) -> dict:
+    """
+    :return: {grading name: ranked suggestions}, from the LATTE name in the conversion file when there is one,
+    otherwise from the grading name itself
+    """
+    return dict((grading_name, index.suggest(latte_name or grading_name, limit=limit, min_similarity=min_similarity))
+                for grading_name, latte_name in unmatched.items())
+
+
+def auto_accept(suggestions: dict, threshold: float) -> dict:
+    """
+    accept the best suggestion of each student if it reaches threshold, is clearly better than the second best, and
+    is not the best suggestion of another student as well
+    :return: {grading name: accepted LATTE name}
+    """
+    best = dict((grading_name, ranked[0][0]) for grading_name, ranked in suggestions.items() if ranked)
+    taken = Counter(best.values())
+    return dict((grading_name, ranked[0][0]) for grading_name, ranked in suggestions.items()
+                if ranked and ranked[0][1] >= threshold and taken[ranked[0][0]] == 1 and
+                (len(ranked) == 1 or ranked[1][1] < ranked[0][1]))
+
+
+def save_matches(matches: dict):
+    """
+    save accepted matches to the conversion file, replacing the LATTE name of students already in it
+    :param matches: {grading name: LATTE name}
+    """
+    pairs = [(matches.get(grading_name, latte_name), grading_name)
+             for latte_name, grading_name in name_convert.read_conversion_file()]
+    existing = set(grading_name for _, grading_name in pairs)
+    pairs += [(latte_name, grading_name) for grading_name, latte_name in matches.items() if grading_name not in existing]
+    name_convert.write_conversion_file(pairs)
+
+
+def ask_matches(suggestions: dict, accepted: dict) -> dict:
+    """
+    let the user pick among the suggestions of each student not accepted yet
+    :return: {grading name: LATTE name} picked by the user
+    """
+    picked = {}
+    for grading_name, ranked in suggestions.items():
+        ranked = [(candidate, score) for candidate, score in ranked
+                  if candidate not in accepted.values() and candidate not in picked.values()]
+        if grading_name in accepted or not ranked:
+            continue
+        answer = input("Enter the number of the LATTE name to use for %s, or press Enter to skip:\n%s\n>" % (
+            grading_name, "\n".join("\t%d. %s (%.2f)" % (i + 1, candidate, score)
+                                    for i, (candidate, score) in enumerate(ranked))))
+        if answer.strip().isdigit() and 1 <= int(answer) <= len(ranked):
+            picked[grading_name] = ranked[int(answer) - 1][0]
+    return picked
+
+
+def main():
+    parser = ArgumentParser(prog="name_match.py",
+                            description="List students on a grading sheet that cannot be matched to a LATTE folder, "
+                                        "with the most similar LATTE names, and save the chosen ones to the name "
+                                        "conversion file %s." % name_convert.OUTPUT_PATH)
+    parser.add_argument("student_folder",
+                        help="path to parent folder whose immediate subdirectories are student LATTE folders.")
+    parser.add_argument("grading_sheet_file", help="grading sheet file, as used in grades_out.py.")
+    parser.add_argument("--sheet_name", type=str, default=None, help="required for .xlsx files only.")
+    parser.add_argument("--limit", type=int, default=SUGGESTION_LIMIT,
+                        help="number of suggestions shown per student (default %d)." % SUGGESTION_LIMIT)
+    parser.add_argument("--accept_above", type=float, default=None,
+                        help="save the best suggestion without asking when its similarity (0 to 1) is at least this "
+                             "value, it is clearly the best one and no other student has it as best suggestion. "
+                             "e.g. 0.8")
+    parser.add_argument("-y", "--yes", action="store_true",
+                        help="do not ask to pick suggestions; only save those accepted with --accept_above.")
+    args = parser.parse_args()
+
+    go = GradesOut(args.student_folder, args.grading_sheet_file, sheet_name=args.sheet_name, verbose=False,
+                   match_folders=False)
+    unmatched, candidates = find_unmatched(go)
+    if not unmatched:
+        print("All %d students on the sheet are matched to a LATTE folder." % len(go.all_info))
+        return
+
+    suggestions = suggest_all(unmatched, NameIndex(candidates), limit=args.limit)
+    print("Students without a LATTE folder: %d of %d. LATTE folders not matched to any student: %d." %
+          (len(unmatched), len(go.all_info), len(candidates)))
+    for grading_name, ranked in suggestions.items():
+        reason = "no folder for %s" % unmatched[grading_name] if unmatched[grading_name] else "not in conversion file"
+        print("%s (%s): %s" % (grading_name, reason, "; ".join("%s (%.2f)" % pair for pair in ranked) or
+                               "no similar LATTE name"))
+
+    accepted = auto_accept(suggestions, args.accept_above) if args.accept_above is not None else {}
+    for grading_name, latte_name in accepted.items():
+        print("Accepted %s -> %s" % (grading_name, latte_name))
+    if not args.yes:
+        accepted.update(ask_matches(suggestions, accepted))
+
+    if accepted:
+        save_matches(accepted)
+        print("Saved %d matches to %s. Students still without a folder: %d." % (
+            len(accepted), name_convert.OUTPUT_PATH, len(unmatched) - len(accepted)))
+    else:
+        print("No matches saved.")
+    if len(accepted) < len(unmatched):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
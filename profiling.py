@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""profiling.py: timing, counters and peak memory of each phase of a grades_out.py run
+A RunProfile records wall-clock and CPU time per phase (e.g. loading the sheet, matching folders, writing reports),
+counters (e.g. rows, bytes written) and peak resident memory, and passes every measurement to registered hooks.
+"""
+
+# Built-in/Generic Imports
+import json
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows; peak memory is then not reported
+    resource = None
+
+__author__ = 'Yonglin Wang'
+__version__ = '0.1.0'
+__maintainer__ = 'Yonglin Wang'
+__email__ = 'yonglinw@brandeis.edu'
+
+
+def peak_rss_mb():
+    """
+    :return: peak resident memory of this process so far in MiB, or None if it cannot be measured
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+class RunProfile:
+
+    def __init__(self, detailed=False):
+        """
+        :param detailed: also take measurements that cost time of their own, e.g. the bytes written, which require
+        encoding every report once more; only worth it when the profile is reported
+        """
+        self.detailed = detailed
+        # {phase: [wall seconds, CPU seconds, number of times entered]}
+        self.phases = OrderedDict()
+        self.counters = OrderedDict()
+        self.peak_rss_mb = peak_rss_mb()
+        self.hooks = []
+        self._lock = threading.Lock()
+
+    def add_hook(self, callback):
+        """
+        register callback(kind, name, value), called after each measurement: kind is "phase" (value is
+        {"wall": seconds, "cpu": seconds}) or "counter" (value is the amount added)
+        """
+        self.hooks.append(callback)
+
+    @contextmanager
+    def phase(self, name: str):
+        """
+        time the enclosed code as (part of) the given phase; a phase entered several times adds up. CPU time is that
+        of the current thread.
+        """
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.thread_time() - cpu
+            with self._lock:
+                totals = self.phases.setdefault(name, [0.0, 0.0, 0])
+                totals[0] += wall
+                totals[1] += cpu
+                totals[2] += 1
+            for hook in self.hooks:
+                hook("phase", name, {"wall": wall, "cpu": cpu})
+
+    def count(self, name: str, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+        for hook in self.hooks:
+            hook("counter", name, amount)
+
+    def sample_memory(self):
+        self.peak_rss_mb = peak_rss_mb()
+
+    def to_dict(self) -> dict:
+        self.sample_memory()
+        return {"phases": OrderedDict((name, {"wall": wall, "cpu": cpu, "calls": calls})
+                                      for name, (wall, cpu, calls) in self.phases.items()),
+                "counters": self.counters, "peak_rss_mb": self.peak_rss_mb}
+
+    def write_json(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=1)
+
+    def summary(self) -> str:
+        """
+        :return: table of phases and counters, for printing. Phases may overlap (e.g. matching folders while
+        validating reports in streaming mode), so their times do not add up to the run time.
+        """
+        self.sample_memory()
+        lines = ["%-20s %10s %10s %8s" % ("Phase", "Wall (s)", "CPU (s)", "Calls")]
+        for name, (wall, cpu, calls) in self.phases.items():
+            lines.append("%-20s %10.3f %10.3f %8d" % (name, wall, cpu, calls))
+        for name, value in self.counters.items():
+            lines.append("%-20s %10d" % (name, value))
+        if self.peak_rss_mb is not None:
+            lines.append("%-20s %10.1f" % ("peak memory (MiB)", self.peak_rss_mb))
+        return "\n".join(lines)
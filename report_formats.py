@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""report_formats.py: renderers of the report model of report_template.py into plain text, Markdown and HTML
+Each student's report is modelled once by ReportTemplate.model and rendered into every requested format from the same
+model. Plain text is the same as ReportTemplate.render gives. HTML pages are self-contained, with a print style sheet,
+so that they can be pasted into the LMS feedback field or printed to PDF by a browser.
+"""
+
+# Built-in/Generic Imports
+import re
+from html import escape
+
+# Own modules
+from report_template import CONTEXT_TITLE, ReportModel, ReportTemplate, format_score
+
+__author__ = 'Yonglin Wang'
+__version__ = '0.1.0'
+__maintainer__ = 'Yonglin Wang'
+__email__ = 'yonglinw@brandeis.edu'
+
+# ###Format of the reports saved by default
+DEFAULT_FORMAT = "txt"
+
+# ###Characters escaped in Markdown text so that grader comments show as written
+MARKDOWN_SPECIAL_REGEX = re.compile(r"([\\`*_\[\]<>#|])")
+
+# ###Style of HTML reports, on screen and when printed
+HTML_STYLE = """body { font-family: sans-serif; line-height: 1.4; max-width: 50em; }
+.item { margin: 0.2em 0; }
+.level-0 { margin-top: 1em; }
+.notice { color: #777; font-style: italic; }
+@page { margin: 2cm; }
+@media print { body { max-width: none; } .item { break-inside: avoid; } }"""
+
+
+class TextRenderer:
+    """
+    plain text report, as saved by default
+    """
+    extension = ".txt"
+    # locale's encoding, as .txt reports have always been saved
+    encoding = None
+
+    def __init__(self, template: ReportTemplate):
+        self.template = template
+
+    def render(self, model: ReportModel) -> str:
+        return self.template.render_model(model)
+
+
+class MarkdownRenderer:
+    """
+    Markdown report: top-level items as paragraphs, indented items as nested list entries
+    """
+    extension = ".md"
+    encoding = "utf-8"
+
+    def __init__(self, template: ReportTemplate):
+        self.template = template
+
+    @staticmethod
+    def escape(text: str) -> str:
+        return MARKDOWN_SPECIAL_REGEX.sub(r"\\\1", text)
+
+    def render(self, model: ReportModel) -> str:
+        output = ["# %s %s\n\n**Student Name:** %s\n\n" % (
+            self.escape(model.title), self.escape(model.assignment_name.replace("\n", " ")), self.escape(model.name))]
+        # levels of the list items enclosing the current one; items are nested relative to them rather than by their
+        # own level, so that e.g. ">>" items right after a paragraph still start a list instead of a code block
+        enclosing = []
+        depth = 0
+        for line in model.lines:
+            in_list = depth > 0
+            if line.level == 0:
+                enclosing = []
+            else:
+                while enclosing and enclosing[-1] >= line.level:
+                    enclosing.pop()
+                enclosing.append(line.level)
+            depth = len(enclosing)
+            # continuation lines of multi-line values stay inside their paragraph or list entry
+            indent = "    " * (depth - 1) + "  " if depth else ""
+            value = self.escape(line.value) if line.entered else "*%s*" % self.escape(line.value)
+            text = "**%s:** %s%s" % (self.escape(line.label), value.replace("\n", "  \n" + indent),
+                                    self.escape(line.suffix))
+            # paragraphs and lists are separated by an empty line
+            if depth == 0:
+                output.append("%s%s\n\n" % ("\n" if in_list else "", text))
+            else:
+                output.append("%s- %s\n" % ("    " * (depth - 1), text))
+
+        if model.context:
+            output.append("%s## %s\n\n| Item | Class mean | Median | Out of |\n| --- | --- | --- | --- |\n" % (
+                "\n" if depth > 0 else "", CONTEXT_TITLE))
+            for line in model.context:
+                output.append("| %s%s | %s | %s | %s |\n" % ("&nbsp;" * 4 * line.level, self.escape(line.label),
+                                                             format_score(line.mean), format_score(line.median),
+                                                             self.escape(line.suffix.lstrip("/"))))
+        return "".join(output)
+
+
+class HtmlRenderer:
+    """
+    self-contained HTML page, one element per item, indented by level
+    """
+    extension = ".html"
+    # as declared in the page
+    encoding = "utf-8"
+
+    def __init__(self, template: ReportTemplate):
+        self.template = template
+
+    def render(self, model: ReportModel) -> str:
+        title = "%s %s" % (escape(model.title), escape(model.assignment_name).replace("\n", "<br>\n"))
+        output = ["<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n<title>%s - %s</title>\n"
+                  "<style>\n%s\n</style>\n</head>\n<body>\n<h1>%s</h1>\n<p><strong>Student Name:</strong> %s</p>\n" % (
+                      escape(model.title), escape(model.name), HTML_STYLE, title, escape(model.name))]
+        for line in model.lines:
+            value = escape(line.value).replace("\n", "<br>\n")
+            if not line.entered:
+                value = "<span class=\"notice\">%s</span>" % value
+            output.append("<div class=\"item level-%d%s\" style=\"margin-left: %dem\"><strong>%s:</strong> "
+                          "<span class=\"value\">%s</span>%s</div>\n" % (
+                              line.level, " comment" if line.is_comment else "", 2 * line.level, escape(line.label),
+                              value, escape(line.suffix)))
+
+        if model.context:
+            output.append("<h2>%s</h2>\n<table>\n<tr><th>Item</th><th>Class mean</th><th>Median</th><th>Out of</th>"
+                          "</tr>\n" % CONTEXT_TITLE)
+            for line in model.context:
+                output.append("<tr><td style=\"padding-left: %dem\">%s</td><td>%s</td><td>%s</td><td>%s</td>"
+                              "</tr>\n" % (2 * line.level, escape(line.label), format_score(line.mean),
+                                             format_score(line.median), escape(line.suffix.lstrip("/"))))
+            output.append("</table>\n")
+        output.append("</body>\n</html>\n")
+        return "".join(output)
+
+
+# ###Renderers by format name, as given to GradesOut(formats=...) and grades_out.py --formats
+RENDERERS = {"txt": TextRenderer, "md": MarkdownRenderer, "html": HtmlRenderer}
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""report_manifest.py: record of distributed reports, used to only rewrite reports whose content changed
+One manifest per assignment alias is saved under conv/, mapping each student on the grading sheet to the hashes of their
+sheet row, the sheet's item header and the generated report, together with the size and modification time of the
+saved report file.
+"""
+
+# Built-in/Generic Imports
+import json
+import os
+from hashlib import sha1
+
+# Own modules
+from atomic_write import atomic_write
+
+__author__ = 'Yonglin Wang'
+__version__ = '0.1.0'
+__maintainer__ = 'Yonglin Wang'
+__email__ = 'yonglinw@brandeis.edu'
+
+# ###Manifest path, formatted with assignment alias
+MANIFEST_PATH = "conv/%s_report_manifest.json"
+
+# separator for hashing lists of cells; cannot appear in a grading sheet cell
+FIELD_SEPARATOR = "\x1f"
+
+
+def hash_fields(fields) -> str:
+    """
+    :param fields: iterable of strings, e.g. cells of a sheet row
+    :return: hex digest identifying the fields and their order
+    """
+    return sha1(FIELD_SEPARATOR.join(fields).encode("utf-8")).hexdigest()
+
+
+class ReportManifest:
+
+    def __init__(self, assn_alias: str):
+        self.path = MANIFEST_PATH % assn_alias
+        try:
+            with open(self.path) as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            self.entries = {}
+
+    def is_current(self, grading_name: str, report_path: str, row_hash: str, header_hash: str) -> bool:
+        """
+        :return: whether the report saved for the student was generated from the same row and header, and is still
+        on disk as it was saved
+        """
+        entry = self.entries.get(grading_name)
+        if not entry or entry["row"] != row_hash or entry["header"] != header_hash:
+            return False
+        return self.is_on_disk(grading_name, report_path)
+
+    def is_on_disk(self, grading_name: str, report_path: str, content_hash=None) -> bool:
+        """
+        :return: whether the recorded report (with the given content, if specified) is still on disk as it was saved
+        """
+        entry = self.entries.get(grading_name)
+        if not entry or entry["path"] != report_path or (content_hash and entry["content"] != content_hash):
+            return False
+        try:
+            stat = os.stat(report_path)
+        except OSError:
+            return False
+        return stat.st_size == entry["size"] and stat.st_mtime_ns == entry["mtime_ns"]
+
+    def record(self, grading_name: str, report_path: str, row_hash: str, header_hash: str, content_hash: str):
+        """
+        record a report saved (or confirmed unchanged) at report_path
+        """
+        stat = os.stat(report_path)
+        self.entries[grading_name] = {"path": report_path, "row": row_hash, "header": header_hash,
+                                      "content": content_hash, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    def save(self):
+        # write to a temporary file first so that an interruption never leaves a corrupt manifest
+        with atomic_write(self.path) as f:
+            json.dump(self.entries, f, indent=1, sort_keys=True)
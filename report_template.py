@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""report_template.py: report layout compiled once per grading sheet from its GradingItems
+Produces the same text as joining GradingItem.insert_info for every item, without recomputing indentation and
+formatting for every cell. Also builds a format-neutral model of each report, rendered by report_formats.py.
+"""
+
+# Built-in/Generic Imports
+from collections import namedtuple
+
+# Own modules
+from grading_item import GradingItem, NO_COMMENT_NOTICE, NO_VALUE_NOTICE, SPACES_PER_INDENT
+
+__author__ = 'Yonglin Wang'
+__version__ = '0.1.0'
+__maintainer__ = 'Yonglin Wang'
+__email__ = 'yonglinw@brandeis.edu'
+
+# values that count as "not entered" in comment and non-comment columns, see GradingItem.insert_info
+COMMENT_EMPTY_VALUES = frozenset(["0", ""])
+VALUE_EMPTY_VALUES = frozenset([""])
+
+# ###Report of one student, independent of output format. title and assignment_name are as given to ReportTemplate,
+# context the class statistics appended to every report, if any
+ReportModel = namedtuple("ReportModel", ["title", "assignment_name", "name", "lines", "context"])
+
+# ###One item of a report: label is the item name without indentation, level the number of ">" before it, value the
+# stripped cell value or the notice shown if not entered, suffix the total score (e.g. "/.5"), if any
+ReportLine = namedtuple("ReportLine", ["label", "level", "value", "suffix", "is_comment", "entered"])
+
+# ###Class statistics of one scored item, appended to every report: label, level and suffix as in ReportLine, mean and
+# median of the class, None if no student has a score
+ContextLine = namedtuple("ContextLine", ["label", "level", "mean", "median", "suffix"])
+
+# ###Heading of the class statistics at the end of reports
+CONTEXT_TITLE = "Class Statistics"
+
+
+def format_score(value) -> str:
+    """
+    :return: value rounded to 2 decimals without trailing zeros, e.g. "0.38" or "4", or "-" if None
+    """
+    return "-" if value is None else "%g" % round(value, 2)
+
+
+class ReportTemplate:
+
+    def __init__(self, items: list, title: str, assignment_name: str):
+        """
+        :param items: list of GradingItem, in the same order as the values of each rendered row
+        :param title: report title, e.g. grades_out.REPORT_TITLE
+        :param assignment_name: formal assignment name following the title
+        """
+        self.title = title.strip()
+        self.assignment_name = assignment_name
+        self.head = "%s %s\n\nStudent Name: " % (title.strip(), assignment_name.replace("\n", "\n\t"))
+
+        # per item: (text before value, continuation indent for line breaks in value, text after value,
+        # values counting as not entered, notice for values not entered)
+        self.layout = [self.compile_item(item) for item in items]
+
+        # per item: (label, level, suffix, is_comment), as in ReportLine
+        self.outline = [self.outline_item(item) for item in items]
+
+        # class statistics and their text, the same at the end of every report
+        self.context = []
+        self.tail = ""
+
+    @staticmethod
+    def compile_item(item: GradingItem) -> tuple:
+        # same indentation as GradingItem.insert_info: 1 for ":" + 1 for space = 2
+        indent = "\n\t".expandtabs(len(item.prefix.lstrip()) + 2)
+        if item.is_comment:
+            return item.prefix + ": ", indent, item.suffix + "\n", COMMENT_EMPTY_VALUES, NO_COMMENT_NOTICE
+        return item.prefix + ": ", indent, item.suffix + "\n", VALUE_EMPTY_VALUES, NO_VALUE_NOTICE
+
+    @staticmethod
+    def outline_item(item: GradingItem) -> tuple:
+        # top-level items start with an empty line, indented ones with SPACES_PER_INDENT spaces per level
+        if item.prefix.startswith("\n"):
+            level = 0
+        else:
+            level = (len(item.prefix) - len(item.prefix.lstrip(" "))) // SPACES_PER_INDENT
+        return item.prefix.strip(), level, item.suffix, item.is_comment
+
+    def set_context(self, lines):
+        """
+        append the given class statistics to every report rendered from now on
+        :param lines: iterable of ContextLine; none to stop appending statistics
+        """
+        self.context = list(lines)
+        if not self.context:
+            self.tail = ""
+            return
+        output = ["\n%s:\n" % CONTEXT_TITLE]
+        for line in self.context:
+            output.append("%s%s: class mean %s%s, median %s%s\n" % (
+                "\t".expandtabs(SPACES_PER_INDENT) * line.level, line.label, format_score(line.mean), line.suffix,
+                format_score(line.median), line.suffix))
+        self.tail = "".join(output)
+
+    def render(self, name: str, values) -> str:
+        """
+        generate string report for one student
+        :param name: name of student to generate report for
+        :param values: student's values on the grading sheet, in the same order as the items of this template
+        :return: string formatted assignment report
+        """
+        output = [self.head, name, "\n\n"]
+
+        for (before, indent, after, empty_values, notice), info in zip(self.layout, values):
+            if "\n" in info:
+                info = info.replace("\n", indent)
+            if info in empty_values:
+                info = notice
+            output += (before, info.strip(), after)
+        output.append(self.tail)
+
+        return "".join(output)
+
+    def model(self, name: str, values) -> ReportModel:
+        """
+        build the format-neutral report of one student, e.g. to render it in several formats at once
+        :param name: name of student to generate report for
+        :param values: student's values on the grading sheet, in the same order as the items of this template
+        :return: ReportModel of the student
+        """
+        lines = []
+        for (label, level, suffix, is_comment), (_, _, _, empty_values, notice), info in zip(self.outline,
+                                                                                             self.layout, values):
+            entered = info not in empty_values
+            lines.append(ReportLine(label, level, info.strip() if entered else notice, suffix, is_comment, entered))
+        return ReportModel(self.title, self.assignment_name, name, lines, self.context)
+
+    def render_model(self, model: ReportModel) -> str:
+        """
+        :return: string report of a model built by self.model, the same as render gives for the same student
+        """
+        output = [self.head, model.name, "\n\n"]
+        for (before, indent, after, _, _), line in zip(self.layout, model.lines):
+            output += (before, line.value.replace("\n", indent), after)
+        output.append(self.tail)
+        return "".join(output)
+
+    def render_all(self, rows) -> list:
+        """
+        generate string reports for many students
+        :param rows: iterable of (name, values), as in render
+        :return: list of string reports in the same order as rows
+        """
+        render = self.render
+        return [render(name, values) for name, values in rows]
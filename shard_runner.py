@@ -0,0 +1,259 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""shard_runner.py: distribute the reports of one grading sheet in shards, each in its own process or on its own machine
+A course-wide grading sheet is split either by section (one shard per LATTE parent folder, each keeping the students
+who have a folder in it) or by hashing student names into a given number of shards of one LATTE parent folder. Each
+shard loads the sheet, matches, validates and saves its students' reports like grades_out.py --yes. The results of all
+shards are merged into one summary. Shards can also be written out as manifest files, run on separate machines sharing
+the same file system, and merged afterward.
+"""
+
+# Built-in/Generic Imports
+import io
+import json
+import os
+import sys
+import time
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+from glob import glob
+from hashlib import sha1
+
+# Own modules
+from atomic_write import atomic_write
+from folder_index import FolderIndex
+from grades_out import GradesOut
+
+__author__ = 'Yonglin Wang'
+__version__ = '0.1.0'
+__maintainer__ = 'Yonglin Wang'
+__email__ = 'yonglinw@brandeis.edu'
+
+# ###File names of shard manifests and of their results, formatted with the shard number
+MANIFEST_NAME = "shard_%03d.json"
+RESULT_NAME = "shard_%03d.result.json"
+
+
+def shard_of(name: str, shards: int) -> int:
+    """
+    :return: shard of the given name, the same in every process and on every machine
+    """
+    return int(sha1(name.encode("utf-8")).hexdigest()[:8], 16) % shards
+
+
+def plan_shards(student_folders: list, grading_sheet_file: str, assignment_alias: str, sheet_name=None, shards=1,
+                allow_overwrite=False, disable_not_found=False) -> list:
+    """
+    :param student_folders: LATTE parent folders; with more than one, there is one shard per folder (by section),
+    otherwise the folder's students are split into the given number of shards by name (by hash)
+    :return: list of shard manifests, as dictionaries
+    """
+    common = {"grading_sheet_file": grading_sheet_file, "assignment_alias": assignment_alias, "sheet_name": sheet_name,
+              "allow_overwrite": allow_overwrite, "disable_not_found": disable_not_found}
+    if len(student_folders) > 1:
+        return [dict(common, shard=i, shards=len(student_folders), mode="section", student_folder=folder,
+                     sections=student_folders)
+                for i, folder in enumerate(student_folders)]
+    return [dict(common, shard=i, shards=shards, mode="hash", student_folder=student_folders[0])
+            for i in range(shards)]
+
+
+def run_shard(manifest: dict) -> dict:
+    """
+    load, match, validate and save the reports of one shard. Errors stop the shard but are returned rather than
+    raised, so that other shards are not affected.
+    :return: result of the shard: {"shard": number, "student_folder": folder, "saved": number of reports saved,
+    "dropped": grading names without a folder in this section (section mode only), "warnings": printed messages,
+    "errors": error messages, "seconds": time}
+    """
+    result = {"shard": manifest["shard"], "student_folder": manifest["student_folder"], "saved": 0, "dropped": [],
+              "warnings": [], "errors": []}
+    start = time.perf_counter()
+    output = io.StringIO()
+    try:
+        with redirect_stdout(output):
+            go = GradesOut(manifest["student_folder"], manifest["grading_sheet_file"],
+                           assn_alias=manifest["assignment_alias"], sheet_name=manifest["sheet_name"], verbose=False,
+                           disable_not_found=manifest["disable_not_found"], match_folders=False)
+
+            if manifest["mode"] == "section":
+                # students of other sections have no folder here; kept to find students in no section at all. Names
+                # that are not exact folder names of any section (e.g. hand-edited conversion entries) are matched as
+                # substrings, as by FolderIndex.lookup, against all folder paths of this section at once.
+                other_names = set()
+                for folder in manifest.get("sections", []):
+                    if folder != manifest["student_folder"]:
+                        other_names.update(FolderIndex.from_directory(folder).by_name)
+                folder_paths = "\n".join([d for paths in go.folder_index.by_name.values() for d in paths] +
+                                          go.folder_index.unparsed)
+
+                def in_section(grading_name: str) -> bool:
+                    latte_name = go.conv_dict.get(grading_name.strip())
+                    if latte_name is None:
+                        return False
+                    if latte_name in go.folder_index.by_name:
+                        return True
+                    return latte_name not in other_names and latte_name in folder_paths
+
+                result["dropped"] = go.keep_rows(in_section)
+            else:
+                # names missing from the conversion table are kept by one shard, which reports them
+                go.keep_rows(lambda grading_name: shard_of(
+                    go.conv_dict.get(grading_name.strip(), grading_name), manifest["shards"]) == manifest["shard"])
+
+            go.match_folders()
+            go.validate_files(warning_only=manifest["allow_overwrite"])
+            result["saved"] = go.distribute_grade()
+    except Exception as exc:
+        result["errors"].append("%s: %s" % (type(exc).__name__, str(exc)))
+    result["warnings"] = [line for line in output.getvalue().splitlines() if line.strip()]
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def run_shards(manifests: list, workers=1) -> list:
+    """
+    run shards in a pool of worker processes, or one after another in this process if workers is 1
+    :return: list of shard results, in shard order
+    """
+    if workers > 1 and len(manifests) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(run_shard, manifests))
+    return [run_shard(manifest) for manifest in manifests]
+
+
+def write_manifests(manifests: list, manifest_dir: str) -> list:
+    """
+    :return: paths of the manifest files written, one per shard
+    """
+    os.makedirs(manifest_dir, exist_ok=True)
+    paths = []
+    for manifest in manifests:
+        path = os.path.join(manifest_dir, MANIFEST_NAME % manifest["shard"])
+        # results of an earlier plan in the same folder no longer apply
+        if os.path.exists(os.path.join(manifest_dir, RESULT_NAME % manifest["shard"])):
+            os.remove(os.path.join(manifest_dir, RESULT_NAME % manifest["shard"]))
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=1, ensure_ascii=False)
+        paths.append(path)
+    return paths
+
+
+def read_results(manifest_dir: str) -> tuple:
+    """
+    :return: (list of shard manifests, list of results of the shards that finished), in shard order
+    """
+    manifests, results = [], []
+    for path in sorted(glob(os.path.join(manifest_dir, "shard_*.json"))):
+        if path.endswith(".result.json"):
+            continue
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        manifests.append(manifest)
+        result_path = os.path.join(manifest_dir, RESULT_NAME % manifest["shard"])
+        if os.path.exists(result_path):
+            with open(result_path, encoding="utf-8") as f:
+                results.append(json.load(f))
+    return manifests, results
+
+
+def print_summary(manifests: list, results: list) -> bool:
+    """
+    print counts, warnings and errors of all shards
+    :return: whether all shards finished without errors and, for sections, every student was in one of them
+    """
+    print("-" * 20)
+    for result in results:
+        print("Shard %d (%s): %d reports saved in %.1f s" % (result["shard"], result["student_folder"],
+                                                             result["saved"], result["seconds"]))
+        for warning in result["warnings"]:
+            print("\t%s" % warning)
+        for error in result["errors"]:
+            print("\tError: %s" % error)
+
+    finished = set(result["shard"] for result in results)
+    missing = [manifest["shard"] for manifest in manifests if manifest["shard"] not in finished]
+    if missing:
+        print("Shards not run yet: %s" % ", ".join(str(shard) for shard in missing))
+
+    # in section mode, students dropped by every section have no folder in any of them
+    unmatched = set()
+    if manifests and manifests[0]["mode"] == "section" and not missing:
+        unmatched = set.intersection(*[set(result["dropped"]) for result in results])
+        if unmatched:
+            print("Error: students on the sheet without a folder in any section, or missing from the name conversion "
+                  "file (no reports saved): %s" % "; ".join(sorted(unmatched)))
+
+    failed = sum(bool(result["errors"]) for result in results)
+    print("Total number of reports saved: %d" % sum(result["saved"] for result in results))
+    print("Total number of shards succeeded: %d of %d" % (len(results) - failed, len(manifests)))
+    return not failed and not missing and not unmatched
+
+
+def main():
+    parser = ArgumentParser(prog="shard_runner.py",
+                            description="Distribute the reports of one grading sheet in shards, by section folder or "
+                                        "by hashing student names, each shard in its own process or machine.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    for command, help_text in [("run", "run all shards here, in worker processes, and print a merged summary."),
+                               ("plan", "write one manifest file per shard, to be run with run_shard on any machine "
+                                        "sharing the file system and merged with merge.")]:
+        sub = commands.add_parser(command, help=help_text)
+        sub.add_argument("grading_sheet_file", help="grading sheet file, as used in grades_out.py.")
+        sub.add_argument("assignment_alias", help="assignment alias, as used in grades_out.py.")
+        sub.add_argument("student_folders", nargs="+",
+                         help="LATTE parent folders. With more than one (e.g. one per section), each is one shard.")
+        sub.add_argument("--sheet_name", type=str, default=None, help="required for .xlsx files only.")
+        sub.add_argument("--shards", type=int, default=1,
+                         help="with a single LATTE parent folder, number of shards to split its students into by "
+                              "name.")
+        sub.add_argument("-a", "--allow_overwrite", action="store_true",
+                         help="allow program to overwrite existing feedback files.")
+        sub.add_argument("--disable_not_found", action="store_true",
+                         help="raise exception for students with no LATTE submission folders instead of saving their "
+                              "reports under LATTE parent directory.")
+        if command == "run":
+            sub.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                             help="number of shards run at the same time, each in its own process (default: number "
+                                  "of CPUs).")
+        else:
+            sub.add_argument("manifest_dir", help="folder to write the shard manifests to.")
+
+    sub = commands.add_parser("run_shard", help="run one shard from its manifest file and save its result next to it.")
+    sub.add_argument("manifest", help="shard manifest file written by plan.")
+
+    sub = commands.add_parser("merge", help="print the merged summary of the shard results in a manifest folder.")
+    sub.add_argument("manifest_dir", help="folder of shard manifests written by plan.")
+
+    args = parser.parse_args()
+
+    if args.command in ("run", "plan"):
+        manifests = plan_shards(args.student_folders, args.grading_sheet_file, args.assignment_alias,
+                                sheet_name=args.sheet_name, shards=args.shards, allow_overwrite=args.allow_overwrite,
+                                disable_not_found=args.disable_not_found)
+        if args.command == "plan":
+            paths = write_manifests(manifests, args.manifest_dir)
+            print("Wrote %d shard manifests to %s. Run \"python shard_runner.py run_shard <manifest>\" for each, then "
+                  "\"python shard_runner.py merge %s\"." % (len(paths), args.manifest_dir, args.manifest_dir))
+            return
+        results = run_shards(manifests, workers=args.workers)
+    elif args.command == "run_shard":
+        with open(args.manifest, encoding="utf-8") as f:
+            manifest = json.load(f)
+        result = run_shard(manifest)
+        result_path = os.path.join(os.path.dirname(args.manifest), RESULT_NAME % manifest["shard"])
+        with atomic_write(result_path, encoding="utf-8") as f:
+            json.dump(result, f, indent=1, ensure_ascii=False)
+        manifests, results = [manifest], [result]
+    else:
+        manifests, results = read_results(args.manifest_dir)
+
+    if not print_summary(manifests, results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
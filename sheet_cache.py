@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""sheet_cache.py: on-disk cache of parsed .xlsx grading sheets
+Parsing Excel files is the slowest step of loading a grading sheet, so the parsed sheet is pickled under conv/ and
+reused as long as the file's path, modification time, size and the sheet name are the same. A cache that cannot be
+loaded (e.g. pickled by another pandas version) is treated as missing and the sheet is parsed again.
+"""
+
+# Built-in/Generic Imports
+import os
+import pickle
+from hashlib import sha1
+
+# Own modules
+from atomic_write import atomic_write
+
+__author__ = 'Yonglin Wang'
+__version__ = '0.1.0'
+__maintainer__ = 'Yonglin Wang'
+__email__ = 'yonglinw@brandeis.edu'
+
+# ###Folder of cached sheets, one file per (grading sheet file, sheet name)
+CACHE_DIR = "conv/sheet_cache"
+
+
+def cache_key(f_path: str, sheet_n: str) -> tuple:
+    stat = os.stat(f_path)
+    return os.path.abspath(f_path), stat.st_mtime_ns, stat.st_size, sheet_n
+
+
+def cache_path(key: tuple) -> str:
+    # only path and sheet name go into the file name, so that a changed file replaces its outdated cache
+    return os.path.join(CACHE_DIR, "%s.pkl" % sha1(("%s\x1f%s" % (key[0], key[3])).encode("utf-8")).hexdigest())
+
+
+def load_cached_sheet(f_path: str, sheet_n: str):
+    """
+    :return: cached headerless DataFrame of the sheet, or None if there is no up-to-date cache
+    """
+    key = cache_key(f_path, sheet_n)
+    try:
+        with open(cache_path(key), "rb") as f:
+            cached_key, df = pickle.load(f)
+    except Exception:
+        # unpickling a DataFrame of another pandas version may fail with almost any error
+        return None
+    return df if cached_key == key else None
+
+
+def save_cached_sheet(f_path: str, sheet_n: str, df):
+    """
+    cache headerless DataFrame of the sheet; failing to cache does not stop the program
+    """
+    key = cache_key(f_path, sheet_n)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with atomic_write(cache_path(key), "wb") as f:
+            pickle.dump((key, df), f, protocol=pickle.HIGHEST_PROTOCOL)
+    except OSError as exc:
+        print("Cannot cache sheet %s of %s: %s" % (sheet_n, f_path, str(exc)))
@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""staged_commit.py: all-or-nothing report distribution through a staging area and a journal
+Reports are first written and fsync'ed under a hidden staging folder inside the LATTE parent folder (so that they are on
+the same filesystem as their targets), then moved into student folders one by one with os.replace. Every step is
+recorded in a journal, so that an interrupted run can be resumed or rolled back with this script.
+"""
+
+# Built-in/Generic Imports
+import json
+import os
+import shutil
+from argparse import ArgumentParser
+
+__author__ = 'Yonglin Wang'
+__version__ = '0.1.0'
+__maintainer__ = 'Yonglin Wang'
+__email__ = 'yonglinw@brandeis.edu'
+
+# ###Name of staging folder created under LATTE parent folder; hidden so it is never mistaken for a student folder
+STAGING_DIR_NAME = ".grades_out_staging"
+
+# ###Name of journal file inside the staging folder, one JSON record per line
+JOURNAL_NAME = "journal.jsonl"
+
+
+def fsync_dir(path: str):
+    """
+    flush directory entries of path to disk, where the platform supports it
+    """
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class StagedCommit:
+    """
+    journal of one staged distribution. Journal records:
+        {"op": "stage", "id": <int>, "target": <report path>}     report staged as <id>.txt
+        {"op": "staged", "count": <int>}                        all reports staged; publishing may start
+        {"op": "publish", "id": <int>, "backup": <bool>}        report moved to target; old file kept as <id>.bak
+    """
+
+    def __init__(self, latte_path: str):
+        self.latte_path = latte_path
+        self.staging_path = os.path.join(latte_path, STAGING_DIR_NAME)
+        self.journal_path = os.path.join(self.staging_path, JOURNAL_NAME)
+
+    def exists(self) -> bool:
+        return os.path.exists(self.journal_path)
+
+    def _staged_file(self, report_id: int) -> str:
+        return os.path.join(self.staging_path, "%d.txt" % report_id)
+
+    def _backup_file(self, report_id: int) -> str:
+        return os.path.join(self.staging_path, "%d.bak" % report_id)
+
+    def read_journal(self):
+        """
+        :return: (targets {id: target path}, fully staged or not, {id: whether target had a backup} for published)
+        """
+        targets, published, staged = {}, {}, False
+        with open(self.journal_path) as f:
+            for line in f:
+                # a partially written last record means the run stopped while writing it
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                if record["op"] == "stage":
+                    targets[record["id"]] = record["target"]
+                elif record["op"] == "staged":
+                    staged = True
+                elif record["op"] == "publish":
+                    published[record["id"]] = record["backup"]
+        return targets, staged, published
+
+    def stage(self, reports):
+        """
+        write all reports into the staging folder and fsync them, recording their targets in a new journal
+        :param reports: iterable of (target path, string report)
+        :return: number of reports staged
+        """
+        if self.exists():
+            raise FileExistsError("An unfinished staged distribution was found at %s. Run \"python staged_commit.py "
+                                  "%s resume\" or \"... rollback\" first." % (self.staging_path, self.latte_path))
+        os.makedirs(self.staging_path, exist_ok=True)
+
+        counter = 0
+        with open(self.journal_path, "w") as journal:
+            for report_id, (target, report) in enumerate(reports):
+                with open(self._staged_file(report_id), "w") as f:
+                    f.write(report)
+                    f.flush()
+                    os.fsync(f.fileno())
+                journal.write(json.dumps({"op": "stage", "id": report_id, "target": target}) + "\n")
+                counter += 1
+
+            fsync_dir(self.staging_path)
+            journal.write(json.dumps({"op": "staged", "count": counter}) + "\n")
+            journal.flush()
+            os.fsync(journal.fileno())
+
+        return counter
+
+    def publish(self) -> int:
+        """
+        move every staged report not yet published to its target, keeping any replaced file as a backup until
+        the distribution is finished. Also used to resume an interrupted publish.
+        :return: number of reports published in total
+        """
+        targets, staged, published = self.read_journal()
+        if not staged:
+            raise RuntimeError("Reports under %s were not completely staged, so they cannot be published. Roll back "
+                               "and re-run the distribution instead." % self.staging_path)
+
+        with open(self.journal_path, "a") as journal:
+            for report_id, target in sorted(targets.items()):
+                if report_id in published:
+                    continue
+                staged_file = self._staged_file(report_id)
+
+                # the move may have happened right before an interruption, without being recorded
+                if not os.path.exists(staged_file):
+                    published[report_id] = os.path.exists(self._backup_file(report_id))
+                else:
+                    has_backup = os.path.exists(target)
+                    # backup may already exist if the run stopped between backing up and moving
+                    if has_backup and not os.path.exists(self._backup_file(report_id)):
+                        try:
+                            os.link(target, self._backup_file(report_id))
+                        except OSError:
+                            shutil.copy2(target, self._backup_file(report_id))
+                    os.replace(staged_file, target)
+                    published[report_id] = has_backup
+
+                journal.write(json.dumps({"op": "publish", "id": report_id, "backup": published[report_id]}) + "\n")
+                journal.flush()
+
+        for target_dir in set(os.path.dirname(target) for target in targets.values()):
+            fsync_dir(target_dir)
+
+        self.clear()
+        return len(published)
+
+    def rollback(self) -> int:
+        """
+        undo all published reports of the journal, restoring any file they replaced, and remove the staging folder
+        :return: number of reports rolled back
+        """
+        targets, _, published = self.read_journal()
+
+        # reports moved right before an interruption are not in the journal but are no longer staged
+        for report_id in targets:
+            if report_id not in published and not os.path.exists(self._staged_file(report_id)) \
+                    and os.path.exists(targets[report_id]):
+                published[report_id] = os.path.exists(self._backup_file(report_id))
+
+        for report_id, has_backup in sorted(published.items(), reverse=True):
+            if has_backup:
+                os.replace(self._backup_file(report_id), targets[report_id])
+            elif os.path.exists(targets[report_id]):
+                os.remove(targets[report_id])
+
+        self.clear()
+        return len(published)
+
+    def clear(self):
+        shutil.rmtree(self.staging_path, ignore_errors=True)
+
+
+def main():
+    parser = ArgumentParser(prog="staged_commit.py",
+                            description="Resume or roll back an interrupted staged distribution of grades_out.py.")
+    parser.add_argument("student_folder", help="path to parent folder whose immediate subdirectories are student "
+                                               "LATTE folders, as used in grades_out.py.")
+    parser.add_argument("action", choices=["status", "resume", "rollback"],
+                        help="status: show progress; resume: save remaining reports; rollback: undo saved reports.")
+    args = parser.parse_args()
+
+    commit = StagedCommit(args.student_folder)
+    if not commit.exists():
+        print("No unfinished staged distribution found under %s." % args.student_folder)
+        return
+
+    if args.action == "status":
+        targets, staged, published = commit.read_journal()
+        print("Reports staged: %d (%s)\nReports saved to student folders: %d" %
+              (len(targets), "complete" if staged else "incomplete", len(published)))
+    elif args.action == "resume":
+        print("Total number of reports saved: %d" % commit.publish())
+    else:
+        print("Total number of reports rolled back: %d" % commit.rollback())
+
+
+if __name__ == "__main__":
+    main()